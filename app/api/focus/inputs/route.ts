@@ -0,0 +1,56 @@
+import { NextResponse } from 'next/server'
+import { spawn } from 'child_process'
+import path from 'path'
+
+function log(message: string, data?: unknown) {
+  const timestamp = new Date().toISOString()
+  console.log(`[${timestamp}] [Focus Inputs] ${message}`, data !== undefined ? JSON.stringify(data, null, 2) : '')
+}
+
+function logError(message: string, error?: unknown) {
+  const timestamp = new Date().toISOString()
+  console.error(`[${timestamp}] [Focus Inputs] ERROR: ${message}`, error)
+}
+
+/** Lance `pronote_client.py focus_inputs` avec le JSON sur stdin. */
+function runFocusInputs(payload: string): Promise<string> {
+  const backendDir = path.join(process.cwd(), 'backend')
+  const pythonScript = path.join(backendDir, 'pronote_client.py')
+  return new Promise((resolve, reject) => {
+    const child = spawn('python', [pythonScript, 'focus_inputs'], {
+      cwd: backendDir,
+      env: { ...process.env, PYTHONIOENCODING: 'utf-8' },
+      timeout: 30000,
+    })
+    let stdout = ''
+    let stderr = ''
+    child.stdout.on('data', chunk => { stdout += chunk })
+    child.stderr.on('data', chunk => { stderr += chunk })
+    child.on('error', reject)
+    child.on('close', () => {
+      if (stderr) log('STDERR:', stderr)
+      resolve(stdout)
+    })
+    child.stdin.end(payload)
+  })
+}
+
+// POST: contrôles et / ou configuration Focus saisis dans l'UI -> backend (plan Focus recalculé)
+export async function POST(request: Request) {
+  try {
+    const body = await request.json()
+    const payload = JSON.stringify({ controles: body.controles, config: body.config })
+    const result = JSON.parse((await runFocusInputs(payload)).trim())
+    log('Résultat:', result)
+    if (result.error) {
+      return NextResponse.json({ success: false, error: result.error }, { status: 400 })
+    }
+    return NextResponse.json({ success: true, data: result })
+  } catch (error) {
+    logError('Exception:', error)
+    return NextResponse.json({
+      success: false,
+      error: error instanceof Error ? error.message : 'Erreur enregistrement Focus'
+    }, { status: 500 })
+  }
+}
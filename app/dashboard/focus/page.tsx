@@ -9,7 +9,7 @@ import { Skeleton } from "@/components/ui/skeleton"
 import { Card, CardContent, CardHeader, CardDescription } from "@/components/ui/card"
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs"
 import { Sparkles, Calculator, Settings } from "lucide-react"
-import { loadControles } from "@/lib/user-config"
+import { loadConfig, loadControles, syncFocusInputs } from "@/lib/user-config"
 import type { Controle } from "@/types/pronote"
 
 function LoadingSkeleton() {
@@ -55,7 +55,10 @@ export default function FocusPage() {
   const [planRefreshKey, setPlanRefreshKey] = useState(0)
 
   useEffect(() => {
-    setControles(loadControles())
+    const stored = loadControles()
+    setControles(stored)
+    // Contrôles et config saisis avant la synchronisation : transmis une fois au backend
+    syncFocusInputs({ controles: stored, config: loadConfig() })
   }, [])
 
   if (loading || !data) {
@@ -0,0 +1,241 @@
+"""
+Analyse des notes précalculée côté backend (portage de lib/grade-analysis.ts).
+Les notes sont parsées une seule fois en tableaux numériques (note / barème × 20,
+coefficients) puis agrégées par matière : moyennes pondérées, évolution,
+tendance pondérée par récence, moyenne générale et tables de notes requises.
+Utilise NumPy si disponible, sinon un chemin Python pur aux résultats identiques.
+"""
+
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel
+    np = None
+
+ANALYTICS_VERSION = 1
+
+# Notes non numériques renvoyées par Pronote
+_NON_NOTES = {"Absent", "Dispensé", "NonNoté", "N.Not"}
+
+# Table des notes requises : moyennes cibles × coefficients de la prochaine note (sur 20)
+REQUIRED_TARGETS = (10, 12, 14, 16, 18)
+REQUIRED_COEFFICIENTS = (1, 2)
+
+# Seuils de pente de lib/grade-analysis.ts (calculateTrend)
+TREND_THRESHOLD = 0.4
+
+
+def parse_note(note) -> Optional[float]:
+    """Parse une note ("12,5" ou "12.5"), None si non numérique."""
+    if note is None:
+        return None
+    if isinstance(note, (int, float)):
+        return float(note)
+    if not note or note in _NON_NOTES:
+        return None
+    try:
+        return float(note.replace(",", "."))
+    except ValueError:
+        return None
+
+
+def normalize_subject(matiere: str) -> str:
+    return (matiere or "").split(" > ")[0].strip().upper()
+
+
+def parse_notes(notes: list[dict]) -> dict:
+    """
+    Parse les notes une seule fois, triées par date croissante.
+    Retourne des colonnes : subjects (noms), subject_idx, dates, on20, coef.
+    """
+    rows = []
+    for n in notes:
+        value = parse_note(n.get("note"))
+        if value is None:
+            continue
+        bareme = parse_note(n.get("bareme")) or 20.0
+        rows.append((n.get("date") or "", normalize_subject(n.get("matiere", "")), value / bareme * 20, n.get("coefficient") or 1.0))
+    rows.sort(key=lambda r: r[0])
+    subjects = sorted({r[1] for r in rows})
+    index = {s: i for i, s in enumerate(subjects)}
+    return {
+        "subjects": subjects,
+        "subject_idx": [index[r[1]] for r in rows],
+        "dates": [r[0] for r in rows],
+        "on20": [float(r[2]) for r in rows],
+        "coef": [float(r[3]) for r in rows],
+    }
+
+
+def _trend(slope: Optional[float]) -> str:
+    if slope is None:
+        return "unknown"
+    if slope > TREND_THRESHOLD:
+        return "up"
+    if slope < -TREND_THRESHOLD:
+        return "down"
+    return "stable"
+
+
+def _required_grade(target: float, coefficient: float, weighted_sum: float, coef_total: float) -> Optional[float]:
+    required = (target * (coef_total + coefficient) - weighted_sum) / coefficient
+    if required < 0 or required > 20:
+        return None
+    return round(required, 2)
+
+
+# === Chemin NumPy ===
+
+def _slope_numpy(y) -> Optional[float]:
+    """Régression linéaire pondérée (poids 1 + 0.3 * i) sur une série chronologique."""
+    n = y.shape[0]
+    if n < 2:
+        return None
+    x = np.arange(n, dtype=float)
+    w = 1 + 0.3 * x
+    xm = np.dot(w, x) / w.sum()
+    ym = np.dot(w, y) / w.sum()
+    dx = x - xm
+    den = np.dot(w, dx * dx)
+    if den == 0:
+        return 0.0
+    return float(np.dot(w, dx * (y - ym)) / den)
+
+
+def _aggregate_numpy(parsed: dict) -> tuple[dict, Optional[float]]:
+    k = len(parsed["subjects"])
+    idx = np.asarray(parsed["subject_idx"], dtype=np.intp)
+    on20 = np.asarray(parsed["on20"], dtype=float)
+    coef = np.asarray(parsed["coef"], dtype=float)
+    dates = parsed["dates"]
+
+    weighted = on20 * coef
+    weighted_sums = np.bincount(idx, weights=weighted, minlength=k)
+    coef_totals = np.bincount(idx, weights=coef, minlength=k)
+    counts = np.bincount(idx, minlength=k)
+
+    # Tables de notes requises pour toutes les matières en une seule diffusion
+    targets = np.asarray(REQUIRED_TARGETS, dtype=float)[None, :, None]
+    coefs = np.asarray(REQUIRED_COEFFICIENTS, dtype=float)[None, None, :]
+    required = (targets * (coef_totals[:, None, None] + coefs) - weighted_sums[:, None, None]) / coefs
+
+    order = np.argsort(idx, kind="stable")
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+    subjects = {}
+    for s, name in enumerate(parsed["subjects"]):
+        rows = order[bounds[s]:bounds[s + 1]]
+        evolution = np.cumsum(weighted[rows]) / np.cumsum(coef[rows])
+        slope = _slope_numpy(on20[rows])
+        subjects[name] = {
+            "notes_count": int(counts[s]),
+            "weighted_sum": float(weighted_sums[s]),
+            "coef_total": float(coef_totals[s]),
+            "moyenne_calculee": float(weighted_sums[s] / coef_totals[s]) if coef_totals[s] else None,
+            "slope": slope,
+            "trend": _trend(slope),
+            "evolution": [[dates[r], round(float(v), 2)] for r, v in zip(rows.tolist(), evolution.tolist())],
+            "required_grades": {
+                str(t): {
+                    str(c): (round(float(required[s, ti, ci]), 2) if 0 <= required[s, ti, ci] <= 20 else None)
+                    for ci, c in enumerate(REQUIRED_COEFFICIENTS)
+                }
+                for ti, t in enumerate(REQUIRED_TARGETS)
+            },
+        }
+    return subjects, _slope_numpy(on20)
+
+
+# === Chemin Python pur ===
+
+def _slope_python(y: list[float]) -> Optional[float]:
+    n = len(y)
+    if n < 2:
+        return None
+    w = [1 + 0.3 * i for i in range(n)]
+    total = sum(w)
+    xm = sum(wi * i for i, wi in enumerate(w)) / total
+    ym = sum(wi * yi for wi, yi in zip(w, y)) / total
+    num = sum(wi * (i - xm) * (yi - ym) for i, (wi, yi) in enumerate(zip(w, y)))
+    den = sum(wi * (i - xm) ** 2 for i, wi in enumerate(w))
+    if den == 0:
+        return 0.0
+    return num / den
+
+
+def _aggregate_python(parsed: dict) -> tuple[dict, Optional[float]]:
+    groups = [[] for _ in parsed["subjects"]]
+    for row, s in enumerate(parsed["subject_idx"]):
+        groups[s].append(row)
+    on20, coef, dates = parsed["on20"], parsed["coef"], parsed["dates"]
+    subjects = {}
+    for s, name in enumerate(parsed["subjects"]):
+        rows = groups[s]
+        weighted_sum = 0.0
+        coef_total = 0.0
+        evolution = []
+        for r in rows:
+            weighted_sum += on20[r] * coef[r]
+            coef_total += coef[r]
+            evolution.append([dates[r], round(weighted_sum / coef_total, 2)])
+        slope = _slope_python([on20[r] for r in rows])
+        subjects[name] = {
+            "notes_count": len(rows),
+            "weighted_sum": weighted_sum,
+            "coef_total": coef_total,
+            "moyenne_calculee": weighted_sum / coef_total if coef_total else None,
+            "slope": slope,
+            "trend": _trend(slope),
+            "evolution": evolution,
+            "required_grades": {
+                str(t): {str(c): _required_grade(t, c, weighted_sum, coef_total) for c in REQUIRED_COEFFICIENTS}
+                for t in REQUIRED_TARGETS
+            },
+        }
+    return subjects, _slope_python(on20)
+
+
+def compute_grade_analytics(notes: list[dict], moyennes: list[dict], use_numpy: Optional[bool] = None) -> dict:
+    """
+    Calcule les analyses à stocker dans le cache (clé "analytics").
+    use_numpy=None choisit NumPy s'il est installé.
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    parsed = parse_notes(notes)
+    aggregate = _aggregate_numpy if use_numpy else _aggregate_python
+    subjects, global_slope = aggregate(parsed)
+
+    # Moyennes officielles Pronote (prioritaires sur la moyenne recalculée, comme côté UI)
+    for m in moyennes:
+        name = normalize_subject(m.get("matiere", ""))
+        entry = subjects.setdefault(name, {
+            "notes_count": 0,
+            "weighted_sum": 0.0,
+            "coef_total": 0.0,
+            "moyenne_calculee": None,
+            "slope": None,
+            "trend": "unknown",
+            "evolution": [],
+            "required_grades": {
+                str(t): {str(c): _required_grade(t, c, 0.0, 0.0) for c in REQUIRED_COEFFICIENTS}
+                for t in REQUIRED_TARGETS
+            },
+        })
+        entry["moyenne_eleve"] = parse_note(m.get("moyenne_eleve"))
+        entry["moyenne_classe"] = parse_note(m.get("moyenne_classe"))
+    for entry in subjects.values():
+        entry.setdefault("moyenne_eleve", entry["moyenne_calculee"])
+        entry.setdefault("moyenne_classe", None)
+
+    official = [v for v in (parse_note(m.get("moyenne_eleve")) for m in moyennes) if v is not None]
+    general_average = sum(official) / len(official) if official else None
+
+    return {
+        "version": ANALYTICS_VERSION,
+        "engine": "numpy" if use_numpy else "python",
+        "general_average": general_average,
+        "trend": _trend(global_slope),
+        "slope": global_slope,
+        "subjects": subjects,
+    }
@@ -0,0 +1,315 @@
+"""
+Benchmarks des étapes de calcul du backend sur des données synthétiques.
+Usage: python bench.py <benchmark> [--years N] [--repeat N]
+"""
+
+import json
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+SUBJECTS = [
+    "MATHEMATIQUES", "PHYSIQUE-CHIMIE", "PHILOSOPHIE", "HISTOIRE-GEOGRAPHIE",
+    "ANGLAIS LV1", "ESPAGNOL LV2", "ED.PHYSIQUE & SPORT.", "SVT",
+    "SES", "NSI", "ENS. MORAL & CIVIQUE", "FRANCAIS",
+]
+
+
+def synthetic_notes(years: int, per_year: int = 300, seed: int = 42) -> list[dict]:
+    """Historique de notes synthétique sur plusieurs années scolaires."""
+    rng = random.Random(seed)
+    start = date(2026 - years, 9, 1)
+    notes = []
+    for _ in range(years * per_year):
+        bareme = rng.choice([20, 20, 20, 10, 40])
+        value = rng.uniform(0, bareme)
+        notes.append({
+            "matiere": rng.choice(SUBJECTS),
+            "note": "Absent" if rng.random() < 0.05 else f"{value:.2f}".replace(".", ","),
+            "bareme": str(bareme),
+            "coefficient": rng.choice([0.5, 1.0, 1.0, 2.0, 3.0]),
+            "moyenne_classe": "",
+            "note_min": "",
+            "note_max": "",
+            "commentaire": "",
+            "date": (start + timedelta(days=rng.randrange(years * 365))).isoformat(),
+        })
+    return notes
+
+
+def synthetic_lessons(weeks: int, seed: int = 42) -> list[dict]:
+    """Emploi du temps synthétique : 7 cours par jour ouvré sur `weeks` semaines."""
+    rng = random.Random(seed)
+    start = date(2026 - max(1, weeks // 52), 9, 7)
+    lessons = []
+    for day in range(weeks * 7):
+        current = start + timedelta(days=day)
+        if current.weekday() >= 5:
+            continue
+        for slot, hour in enumerate([8, 9, 10, 11, 13, 14, 15]):
+            lessons.append({
+                "id": f"{current.isoformat()}-{slot}",
+                "matiere": rng.choice(SUBJECTS),
+                "professeur": "M. Dupont",
+                "salle": f"S{rng.randint(100, 120)}",
+                "debut": f"{current.isoformat()}T{hour:02d}:00:00",
+                "fin": f"{current.isoformat()}T{hour:02d}:55:00",
+                "annule": rng.random() < 0.03,
+                "modifie": rng.random() < 0.05,
+                "contenu": "",
+            })
+    return lessons
+
+
+def synthetic_devoirs(count: int, seed: int = 42) -> list[dict]:
+    rng = random.Random(seed)
+    start = date(2026, 9, 1)
+    return [
+        {
+            "matiere": rng.choice(SUBJECTS),
+            "description": f"Exercices {rng.randint(1, 40)} p.{rng.randint(10, 300)}",
+            "date_rendu": (start + timedelta(days=rng.randrange(300))).isoformat(),
+            "fait": rng.random() < 0.5,
+            "fichiers": [],
+        }
+        for _ in range(count)
+    ]
+
+
+def synthetic_moyennes(seed: int = 42) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "matiere": s,
+            "moyenne_eleve": f"{rng.uniform(6, 19):.2f}".replace(".", ","),
+            "moyenne_classe": f"{rng.uniform(8, 14):.2f}".replace(".", ","),
+            "moyenne_min": "",
+            "moyenne_max": "",
+        }
+        for s in SUBJECTS
+    ]
+
+
+def synthetic_controles(start: date, count: int = 4, seed: int = 42) -> list[dict]:
+    """Contrôles saisis dans l'UI (format localStorage), dans les 10 jours suivant start."""
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"controle-{i}",
+            "matiere": rng.choice(SUBJECTS),
+            "date": (start + timedelta(days=rng.randint(1, 10))).isoformat(),
+            "type": rng.choice(["ds", "interro", "oral", "tp"]),
+            "coefficient": rng.choice([1, 2]),
+        }
+        for i in range(count)
+    ]
+
+
+def timed(fn, repeat: int) -> dict:
+    """Exécute fn `repeat` fois et retourne min / moyenne en millisecondes."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    return {"min_ms": round(min(durations), 3), "mean_ms": round(sum(durations) / len(durations), 3)}
+
+
+def bench_analytics(options: dict) -> dict:
+    from analytics import compute_grade_analytics, np
+    repeat = int(options.get("repeat", 5))
+    moyennes = synthetic_moyennes()
+    results = {}
+    for years in [int(y) for y in options.get("years", "1,3,5,10").split(",")]:
+        notes = synthetic_notes(years)
+        row = {"notes": len(notes), "python": timed(lambda: compute_grade_analytics(notes, moyennes, use_numpy=False), repeat)}
+        if np is not None:
+            row["numpy"] = timed(lambda: compute_grade_analytics(notes, moyennes, use_numpy=True), repeat)
+        results[f"{years}y"] = row
+    return results
+
+
+def bench_indexes(options: dict) -> dict:
+    from indexes import build_indexes
+    repeat = int(options.get("repeat", 5))
+    results = {}
+    for years in [int(y) for y in options.get("years", "1,3,5").split(",")]:
+        data = {
+            "lessons": synthetic_lessons(years * 52),
+            "devoirs": synthetic_devoirs(years * 400),
+            "notes": synthetic_notes(years),
+        }
+        size = {k: len(v) for k, v in data.items()}
+        results[f"{years}y"] = {**size, "build": timed(lambda: build_indexes(data), repeat)}
+    return results
+
+
+def bench_focus(options: dict) -> dict:
+    """
+    Plan Focus de 7 jours : calcul complet, sans changement, un devoir modifié,
+    puis un contrôle ajouté dans l'UI (enregistrement via save_inputs compris).
+    """
+    import tempfile
+    from pathlib import Path
+    from analytics import compute_grade_analytics
+    from focus import DEFAULT_CONFIG, generate_weekly_plan, load_controles, save_inputs
+    repeat = int(options.get("repeat", 5))
+    start = date(2026, 10, 5)
+    controles = synthetic_controles(start)
+    results = {}
+    for count in [int(c) for c in options.get("devoirs", "200,500,1000").split(",")]:
+        data = {
+            "devoirs": synthetic_devoirs(count),
+            "notes": synthetic_notes(1),
+            "moyennes": synthetic_moyennes(),
+            "lessons": synthetic_lessons(60),
+        }
+        data["analytics"] = compute_grade_analytics(data["notes"], data["moyennes"])
+        plan = lambda previous=None, controles=controles: generate_weekly_plan(data, previous, controles=controles, config=DEFAULT_CONFIG, start=start)
+        previous = plan()
+        # Un devoir à rendre dans 10 jours passe à « fait » : seuls les jours qui le voyaient sont recalculés
+        target = next(d for d in data["devoirs"] if not d["fait"] and d["date_rendu"] == (start + timedelta(days=10)).isoformat())
+
+        def changed():
+            target["fait"] = True
+            try:
+                return plan(previous)
+            finally:
+                target["fait"] = False
+
+        # Nouveau contrôle dans 2 jours : commande focus_inputs (écriture puis relecture de controles.json)
+        added = controles + [{"id": "controle-new", "matiere": SUBJECTS[0], "date": (start + timedelta(days=2)).isoformat(), "type": "ds"}]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "controles.json"
+
+            def controle_added():
+                save_inputs(controles=added, controles_path=path)
+                return plan(previous, load_controles(path))
+
+            results[f"{count}"] = {
+                "full": timed(plan, repeat),
+                "unchanged": timed(lambda: plan(previous), repeat),
+                "one_devoir_changed": timed(changed, repeat),
+                "controle_added": timed(controle_added, repeat),
+                "recomputed_days": {
+                    "unchanged": len(plan(previous)["recomputed"]),
+                    "one_devoir_changed": len(changed()["recomputed"]),
+                    "controle_added": len(controle_added()["recomputed"]),
+                },
+                "test_prep_tasks": sum(
+                    1 for entry in plan()["days"] for task in entry["plan"]["tasks"] if task["type"] == "testPrep"
+                ),
+            }
+    return results
+
+
+def bench_timetable(options: dict) -> dict:
+    """Index d'intervalles sur une année d'emploi du temps, comparé à un parcours linéaire."""
+    import timetable
+    repeat = int(options.get("repeat", 5))
+    queries = int(options.get("queries", 200))
+    lessons = synthetic_lessons(int(options.get("weeks", 52)))
+    index = timetable.build_timetable(lessons)
+    rng = random.Random(7)
+    days = sorted({l["debut"][:10] for l in lessons})
+    picks = [rng.choice(days) for _ in range(queries)]
+    weeks = [(day, (date.fromisoformat(day) + timedelta(days=6)).isoformat()) for day in picks]
+
+    def scan_free():
+        # Ancienne approche : reparser et filtrer tous les cours pour chaque jour
+        for day in picks:
+            busy = sorted(
+                (datetime.fromisoformat(l["debut"]), datetime.fromisoformat(l["fin"]))
+                for l in lessons if l["debut"][:10] == day and not l["annule"]
+            )
+
+    def scan_next():
+        for day in picks:
+            after = f"{day}T12:00:00"
+            min((l for l in lessons if not l["annule"] and l["debut"] >= after), key=lambda l: l["debut"], default=None)
+
+    return {
+        "lessons": len(lessons),
+        "queries": queries,
+        "build": timed(lambda: timetable.build_timetable(lessons), repeat),
+        "free_slots": {
+            "scan": timed(scan_free, repeat),
+            "index": timed(lambda: [timetable.free_slots(index, lessons, day) for day in picks], repeat),
+        },
+        "next_lesson": {
+            "scan": timed(scan_next, repeat),
+            "index": timed(lambda: [timetable.next_lesson(index, lessons, f"{day}T12:00:00") for day in picks], repeat),
+        },
+        "week_overlaps_and_canceled": timed(
+            lambda: [(timetable.overlaps(index, lessons, day, end), timetable.canceled(index, lessons, day, end)) for day, end in weeks],
+            repeat,
+        ),
+    }
+
+
+def _legacy_log(stream, message: str, data=None):
+    """Ancien log() de pronote_client.py : horodatage et formatage systématiques."""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    if data is not None:
+        print(f"[{timestamp}] [Python] {message}: {data}", file=stream)
+    else:
+        print(f"[{timestamp}] [Python] {message}", file=stream)
+
+
+def bench_logging(options: dict) -> dict:
+    """Surcoût des ~20 appels de log d'une commande `data`, par configuration."""
+    import os
+    import logger
+    repeat = int(options.get("repeat", 5))
+    calls = int(options.get("calls", 2000))
+    creds = {"url": "https://0000000a.index-education.net/pronote/mobile.eleve.html", "username": "eleve", "password": "x" * 64, "uuid": "u" * 36}
+    eleve = {"nom": "Eleve Test", "etablissement": "Lycee", "classe": "T1", "periode_actuelle": "Trimestre 1"}
+    results = {}
+
+    with open(os.devnull, "w") as devnull:
+        def legacy():
+            for _ in range(calls):
+                _legacy_log(devnull, "=== CONNECT WITH TOKEN ===")
+                _legacy_log(devnull, "Credentials chargés", {"url_original": creds["url"], "username": creds["username"], "password_length": len(creds["password"]), "uuid": creds["uuid"]})
+                _legacy_log(devnull, f"Connexion établie, logged_in = {True}")
+                _legacy_log(devnull, "Info élève récupérées", eleve)
+
+        def current():
+            for _ in range(calls):
+                logger.debug("=== CONNECT WITH TOKEN ===")
+                logger.debug("Credentials chargés", data=lambda: {"url_original": creds["url"], "username": creds["username"], "password_length": len(creds["password"]), "uuid": creds["uuid"]})
+                logger.debug("Connexion établie, logged_in = %s", True)
+                logger.debug("Info élève récupérées", data=eleve)
+
+        results["legacy"] = timed(legacy, repeat)
+        for name, level, use_queue in [("off", "WARNING", False), ("debug_sync", "DEBUG", False), ("debug_queue", "DEBUG", True)]:
+            logger.configure(level, use_queue, stream=devnull)
+            results[name] = timed(current, repeat)
+        logger.configure()
+    results["calls"] = calls * 4
+    return results
+
+
+BENCHMARKS = {
+    "analytics": bench_analytics,
+    "indexes": bench_indexes,
+    "focus": bench_focus,
+    "timetable": bench_timetable,
+    "logging": bench_logging,
+}
+
+
+def main():
+    from pronote_client import _parse_options
+    positional, options = _parse_options(sys.argv[1:])
+    names = positional or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        print(f"Benchmarks inconnus: {', '.join(unknown)} (disponibles: {', '.join(BENCHMARKS)})")
+        sys.exit(1)
+    print(json.dumps({name: BENCHMARKS[name](options) for name in names}, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
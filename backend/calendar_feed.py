@@ -0,0 +1,249 @@
+"""
+Flux iCalendar (emploi du temps et devoirs) généré de façon incrémentale.
+
+À chaque rafraîchissement, seuls les événements dont le contenu a changé sont
+re-rendus, et seuls les fragments des semaines ISO touchées sont reconstruits.
+Événements et fragments sont conservés dans ics_cache.json. Le flux complet est
+la concaténation des fragments, avec un hash de contenu stable (ETag).
+Un client calendrier qui interroge le flux ne déclenche donc aucun appel
+Pronote et presque aucun calcul.
+
+Chaque événement garde un DTSTAMP (UTC) et un SEQUENCE, mis à jour seulement
+quand son contenu change (empreinte calculée sans eux) : les clients voient
+une annulation ou une modification, un événement inchangé reste identique.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+ICS_CACHE_FILE = Path(__file__).parent / "ics_cache.json"
+ICS_CACHE_VERSION = 2
+
+# Les semaines plus anciennes sont retirées du flux
+HISTORY_WEEKS = 52
+
+PRODID = "-//Personal Pronote//Emploi du temps//FR"
+CALENDAR_NAME = "Pronote"
+
+
+def _escape(text: str) -> str:
+    return (
+        (text or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """Plie les lignes à 75 octets (RFC 5545 §3.1)."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        # Ne pas couper au milieu d'un caractère UTF-8
+        while cut > 0 and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+    parts.append(encoded.decode("utf-8"))
+    return "\r\n ".join(parts)
+
+
+def _ics_datetime(value: str) -> str:
+    """ISO local (heure flottante, comme Pronote) -> AAAAMMJJTHHMMSS."""
+    return datetime.fromisoformat(value).strftime("%Y%m%dT%H%M%S")
+
+
+def _week(day: str) -> str:
+    year, week, _ = date.fromisoformat(day[:10]).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _uid_hash(*parts: str) -> str:
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _lesson_event(lesson: dict) -> Optional[dict]:
+    if not lesson.get("debut") or not lesson.get("fin"):
+        return None
+    uid = f"lesson-{lesson.get('id') or _uid_hash(lesson.get('matiere', ''), lesson['debut'])}@personal-pronote"
+    status = lesson.get("modifie")
+    summary = lesson.get("matiere", "")
+    if lesson.get("annule"):
+        summary += " (annulé)"
+    description = "\n".join(filter(None, [lesson.get("professeur", ""), lesson.get("contenu", "")]))
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTART:{_ics_datetime(lesson['debut'])}",
+        f"DTEND:{_ics_datetime(lesson['fin'])}",
+        f"SUMMARY:{_escape(summary)}",
+    ]
+    if lesson.get("salle"):
+        lines.append(f"LOCATION:{_escape(lesson['salle'])}")
+    if description:
+        lines.append(f"DESCRIPTION:{_escape(description)}")
+    lines.append(f"STATUS:{'CANCELLED' if lesson.get('annule') else 'CONFIRMED'}")
+    lines.append(f"X-PRONOTE-ANNULE:{'TRUE' if lesson.get('annule') else 'FALSE'}")
+    lines.append(f"X-PRONOTE-MODIFIE:{'TRUE' if status else 'FALSE'}")
+    if isinstance(status, str) and status:
+        lines.append(f"X-PRONOTE-STATUT:{_escape(status)}")
+    lines.append("END:VEVENT")
+    return {"uid": uid, "kind": "lessons", "date": lesson["debut"][:10], "lines": lines}
+
+
+def _devoir_event(devoir: dict) -> Optional[dict]:
+    day = devoir.get("date_rendu")
+    if not day:
+        return None
+    # Identifiant Pronote si disponible : une description modifiée reste le même événement
+    key = devoir.get("id") or _uid_hash(devoir.get("matiere", ""), day, devoir.get("description", ""))
+    uid = f"devoir-{key}@personal-pronote"
+    start = date.fromisoformat(day[:10])
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTART;VALUE=DATE:{start.strftime('%Y%m%d')}",
+        f"DTEND;VALUE=DATE:{(start + timedelta(days=1)).strftime('%Y%m%d')}",
+        f"SUMMARY:{_escape('Devoir - ' + devoir.get('matiere', ''))}",
+    ]
+    if devoir.get("description"):
+        lines.append(f"DESCRIPTION:{_escape(devoir['description'])}")
+    lines.append("TRANSP:TRANSPARENT")
+    lines.append(f"X-PRONOTE-FAIT:{'TRUE' if devoir.get('fait') else 'FALSE'}")
+    lines.append("END:VEVENT")
+    return {"uid": uid, "kind": "devoirs", "date": day[:10], "lines": lines}
+
+
+def _source_events(data: dict) -> list[dict]:
+    events = []
+    for lesson in data.get("lessons") or []:
+        event = _lesson_event(lesson)
+        if event:
+            events.append(event)
+    for devoir in data.get("devoirs") or []:
+        event = _devoir_event(devoir)
+        if event:
+            events.append(event)
+    return events
+
+
+def load_cache(path: Path = ICS_CACHE_FILE) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("version") == ICS_CACHE_VERSION:
+            return cache
+    except (FileNotFoundError, ValueError):
+        pass
+    return {"version": ICS_CACHE_VERSION, "events": {}, "weeks": {}, "hash": ""}
+
+
+def _write_atomic(path: Path, cache: dict) -> None:
+    """Écrit le cache dans un fichier temporaire voisin puis le renomme : jamais de fichier tronqué."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def update(data: dict, path: Path = ICS_CACHE_FILE, windows: Optional[dict] = None) -> dict:
+    """
+    Intègre un rafraîchissement au cache iCalendar. `windows` donne, par type
+    (lessons, devoirs), la période réellement récupérée ({type: (début, fin)}
+    en dates ISO) : les événements absents des nouvelles données y sont
+    retirés, même si le type revient vide. Sans période, rien n'est retiré ;
+    les semaines passées restent dans le flux.
+    Retourne {"changed_weeks", "hash"}.
+    """
+    cache = load_cache(path)
+    events = cache["events"]
+    dirty: set[str] = set()
+
+    oldest = _week((date.today() - timedelta(weeks=HISTORY_WEEKS)).isoformat())
+    fresh = [event for event in _source_events(data) if _week(event["date"]) >= oldest]
+    windows = {kind: (str(lo)[:10], str(hi)[:10]) for kind, (lo, hi) in (windows or {}).items() if kind in data}
+
+    fresh_uids = {event["uid"] for event in fresh}
+    for uid, stored in list(events.items()):
+        window = windows.get(stored["kind"])
+        if uid not in fresh_uids and window and window[0] <= stored["date"] <= window[1]:
+            dirty.add(stored["week"])
+            del events[uid]
+
+    dtstamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    for event in fresh:
+        # Empreinte du contenu seul : DTSTAMP / SEQUENCE n'avancent que s'il change
+        digest = hashlib.sha1("\r\n".join(event["lines"]).encode("utf-8")).hexdigest()
+        stored = events.get(event["uid"])
+        if stored and stored["hash"] == digest:
+            continue
+        sequence = stored["sequence"] + 1 if stored else 0
+        lines = event["lines"][:2] + [f"DTSTAMP:{dtstamp}", f"SEQUENCE:{sequence}"] + event["lines"][2:]
+        week = _week(event["date"])
+        if stored:
+            dirty.add(stored["week"])
+        dirty.add(week)
+        events[event["uid"]] = {
+            "kind": event["kind"],
+            "date": event["date"],
+            "week": week,
+            "hash": digest,
+            "sequence": sequence,
+            "ics": "\r\n".join(_fold(line) for line in lines),
+        }
+
+    # Historique limité
+    for uid, stored in list(events.items()):
+        if stored["week"] < oldest:
+            dirty.add(stored["week"])
+            del events[uid]
+
+    if dirty:
+        by_week: dict[str, list[dict]] = {}
+        for uid, stored in events.items():
+            if stored["week"] in dirty:
+                by_week.setdefault(stored["week"], []).append(stored)
+        for week in dirty:
+            members = sorted(by_week.get(week, []), key=lambda e: (e["date"], e["ics"]))
+            if not members:
+                cache["weeks"].pop(week, None)
+                continue
+            fragment = "\r\n".join(e["ics"] for e in members)
+            cache["weeks"][week] = {"hash": hashlib.sha1(fragment.encode("utf-8")).hexdigest(), "ics": fragment}
+        cache["hash"] = _feed_hash(cache["weeks"])
+        _write_atomic(path, cache)
+
+    return {"changed_weeks": sorted(dirty), "hash": cache["hash"]}
+
+
+def _feed_hash(weeks: dict) -> str:
+    return hashlib.sha256("\n".join(f"{w}:{weeks[w]['hash']}" for w in sorted(weeks)).encode("utf-8")).hexdigest()
+
+
+def render(cache: dict) -> str:
+    """Calendrier complet à partir des fragments en cache."""
+    header = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{CALENDAR_NAME}",
+    ]
+    fragments = [cache["weeks"][w]["ics"] for w in sorted(cache["weeks"])]
+    return "\r\n".join(header + fragments + ["END:VCALENDAR"]) + "\r\n"
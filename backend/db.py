@@ -5,27 +5,49 @@ Remplace credentials.json et data.json.
 
 import os
 import json
+import hashlib
+import select
 from datetime import datetime
-from typing import Optional
+from typing import Iterator, Optional
 
 # Connexion lazy pour éviter d'importer psycopg2 si DATABASE_URL absent
 _conn = None
 
+# Canal NOTIFY émis à chaque écriture du cache ayant modifié au moins une section
+CACHE_CHANNEL = "pronote_cache"
 
-def _get_conn():
-    global _conn
-    if _conn is not None:
-        return _conn
+
+def _connect():
+    """Ouvre une nouvelle connexion autocommit."""
     url = os.environ.get("DATABASE_URL")
     if not url:
         raise RuntimeError("DATABASE_URL non défini")
     try:
         import psycopg2
-        _conn = psycopg2.connect(url)
-        _conn.autocommit = True
-        return _conn
     except ImportError:
         raise RuntimeError("psycopg2 requis: pip install psycopg2-binary")
+    conn = psycopg2.connect(url)
+    conn.autocommit = True
+    return conn
+
+
+def _get_conn():
+    global _conn
+    if _conn is not None:
+        return _conn
+    _conn = _connect()
+    return _conn
+
+
+def section_hashes(data: dict) -> dict:
+    """Empreinte SHA-256 du contenu de chaque section du cache (hors export_date)."""
+    hashes = {}
+    for name, value in data.items():
+        if name == "export_date":
+            continue
+        payload = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        hashes[name] = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return hashes
 
 
 def get_credentials() -> Optional[dict]:
@@ -94,8 +116,95 @@ def get_cache() -> Optional[dict]:
         raise
 
 
-def set_cache(data: dict) -> None:
-    """Enregistre le cache (upsert). export_date peut être dans data."""
+def get_section_hashes(cache_id: int = 1) -> Optional[dict]:
+    """Retourne {section: hash} sans lire les données (None si pas de cache)."""
+    conn = _get_conn()
+    with conn.cursor() as cur:
+        cur.execute("SELECT section_hashes FROM pronote_cache WHERE id = %s", (cache_id,))
+        row = cur.fetchone()
+        return (row[0] or {}) if row else None
+
+
+def get_cache_sections(names: list[str], cache_id: int = 1) -> dict:
+    """Retourne {section: JSON texte} pour les seules sections demandées."""
+    conn = _get_conn()
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT s.key, s.value::text
+            FROM pronote_cache, jsonb_each(pronote_cache.data) AS s
+            WHERE pronote_cache.id = %s AND s.key = ANY(%s)
+            """,
+            (cache_id, list(names)),
+        )
+        return {key: text for key, text in cur.fetchall()}
+
+
+def get_cache_snapshot(names: list[str], cache_id: int = 1) -> Optional[tuple[dict, dict]]:
+    """
+    ({section: hash}, {section: JSON texte}) lus dans la même ligne : le hash
+    correspond toujours au texte retourné. None si pas de cache.
+    """
+    conn = _get_conn()
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT section_hashes,
+                   ARRAY(SELECT ARRAY[s.key, s.value::text] FROM jsonb_each(data) AS s WHERE s.key = ANY(%s))
+            FROM pronote_cache WHERE id = %s
+            """,
+            (list(names), cache_id),
+        )
+        row = cur.fetchone()
+    if row is None:
+        return None
+    return row[0] or {}, {key: text for key, text in row[1]}
+
+
+def iter_cache_section(
+    section: str,
+    date_field: str,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    matiere: Optional[str] = None,
+    batch_size: int = 10000,
+    cache_id: int = 1,
+) -> Iterator[dict]:
+    """
+    Parcourt les éléments d'une section du cache via un curseur serveur
+    (batch_size éléments par aller-retour), filtres de date et de matière
+    appliqués côté PostgreSQL. Connexion dédiée : un curseur nommé exige une
+    transaction, incompatible avec la connexion autocommit partagée.
+    """
+    conn = _connect()
+    conn.autocommit = False
+    try:
+        with conn.cursor(name="pronote_export") as cur:
+            cur.itersize = batch_size
+            cur.execute(
+                """
+                SELECT e.value
+                FROM pronote_cache, jsonb_array_elements(pronote_cache.data -> %(section)s) AS e
+                WHERE pronote_cache.id = %(id)s
+                  AND (%(from)s::text IS NULL OR left(e.value ->> %(field)s, 10) >= %(from)s)
+                  AND (%(to)s::text IS NULL OR left(e.value ->> %(field)s, 10) <= %(to)s)
+                  AND (%(matiere)s::text IS NULL OR lower(e.value ->> 'matiere') = lower(%(matiere)s))
+                """,
+                {"section": section, "id": cache_id, "field": date_field, "from": date_from, "to": date_to, "matiere": matiere},
+            )
+            for (value,) in cur:
+                yield value if isinstance(value, dict) else json.loads(value)
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+def set_cache(data: dict) -> dict:
+    """
+    Enregistre le cache (upsert). export_date peut être dans data.
+    Émet un NOTIFY sur CACHE_CHANNEL avec les sections dont le contenu a changé
+    et retourne ces sections ({nom: hash}).
+    """
     conn = _get_conn()
     export_date = data.get("export_date")
     if isinstance(export_date, str):
@@ -106,18 +215,115 @@ def set_cache(data: dict) -> None:
     elif export_date is None:
         export_date = datetime.utcnow()
     now = datetime.utcnow()
+    hashes = section_hashes(data)
     with conn.cursor() as cur:
+        # Empreintes précédentes lues et remplacées dans la même instruction
+        # (ligne verrouillée) : une écriture concurrente ne fausse pas le diff
         cur.execute(
             """
-            INSERT INTO pronote_cache (id, data, export_date, updated_at)
-            VALUES (1, %s::jsonb, %s, %s)
+            WITH old AS (
+                SELECT section_hashes FROM pronote_cache WHERE id = 1 FOR UPDATE
+            )
+            INSERT INTO pronote_cache (id, data, section_hashes, export_date, updated_at)
+            VALUES (1, %s::jsonb, %s::jsonb, %s, %s)
             ON CONFLICT (id) DO UPDATE SET
                 data = EXCLUDED.data,
+                section_hashes = EXCLUDED.section_hashes,
                 export_date = EXCLUDED.export_date,
                 updated_at = EXCLUDED.updated_at
+            RETURNING (SELECT section_hashes FROM old)
             """,
-            (json.dumps(data, ensure_ascii=False), export_date, now),
+            (json.dumps(data, ensure_ascii=False), json.dumps(hashes), export_date, now),
         )
+        previous = cur.fetchone()[0] or {}
+        changed = {name: h for name, h in hashes.items() if previous.get(name) != h}
+        removed = [name for name in previous if name not in hashes]
+        if changed or removed:
+            _notify(cur, {
+                "id": 1,
+                "export_date": export_date.isoformat(),
+                "sections": changed,
+                "removed": removed,
+            })
+    return changed
+
+
+def set_cache_sections(sections: dict) -> dict:
+    """
+    Met à jour les seules sections fournies (export_date compris), les autres
+    restent inchangées. Même NOTIFY et même retour que set_cache.
+    """
+    conn = _get_conn()
+    export_date = sections.get("export_date")
+    try:
+        export_date = datetime.fromisoformat(export_date.replace("Z", "+00:00"))
+    except Exception:
+        export_date = datetime.utcnow()
+    now = datetime.utcnow()
+    hashes = section_hashes(sections)
+    with conn.cursor() as cur:
+        # Même lecture verrouillée des empreintes précédentes que set_cache
+        cur.execute(
+            """
+            WITH old AS (
+                SELECT section_hashes FROM pronote_cache WHERE id = 1 FOR UPDATE
+            )
+            INSERT INTO pronote_cache (id, data, section_hashes, export_date, updated_at)
+            VALUES (1, %s::jsonb, %s::jsonb, %s, %s)
+            ON CONFLICT (id) DO UPDATE SET
+                data = COALESCE(pronote_cache.data, '{}'::jsonb) || EXCLUDED.data,
+                section_hashes = COALESCE(pronote_cache.section_hashes, '{}'::jsonb) || EXCLUDED.section_hashes,
+                export_date = EXCLUDED.export_date,
+                updated_at = EXCLUDED.updated_at
+            RETURNING (SELECT section_hashes FROM old)
+            """,
+            (json.dumps(sections, ensure_ascii=False), json.dumps(hashes), export_date, now),
+        )
+        previous = cur.fetchone()[0] or {}
+        changed = {name: h for name, h in hashes.items() if previous.get(name) != h}
+        if changed:
+            _notify(cur, {
+                "id": 1,
+                "export_date": export_date.isoformat(),
+                "sections": changed,
+                "removed": [],
+            })
+    return changed
+
+
+def _notify(cur, payload: dict) -> None:
+    """NOTIFY sur CACHE_CHANNEL (payload limité à 8000 octets par PostgreSQL)."""
+    cur.execute(
+        "SELECT pg_notify(%s, %s)",
+        (CACHE_CHANNEL, json.dumps(payload, ensure_ascii=False, separators=(",", ":"))),
+    )
+
+
+def listen_cache_updates(timeout: Optional[float] = None) -> Iterator[dict]:
+    """
+    Écoute CACHE_CHANNEL sur une connexion dédiée et produit chaque invalidation
+    ({"id", "export_date", "sections": {nom: hash}, "removed": [...]}).
+    Si timeout est défini, produit {} après chaque période d'inactivité
+    (utile pour émettre un keep-alive côté SSE/WebSocket).
+    """
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {CACHE_CHANNEL}")
+        while True:
+            ready, _, _ = select.select([conn], [], [], timeout)
+            if not ready:
+                yield {}
+                continue
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                try:
+                    yield json.loads(notify.payload)
+                except ValueError:
+                    continue
+    finally:
+        conn.close()
 
 
 def use_database() -> bool:
@@ -0,0 +1,344 @@
+"""
+Export en flux des sections historiques (notes, absences, retards, cours, devoirs)
+vers Parquet (si pyarrow est installé) ou CSV, pour les bilans annuels.
+
+Les enregistrements sont lus un par un depuis le stockage : curseur serveur sur
+jsonb_array_elements côté Neon, lecture incrémentale du JSON côté data.json
+(ou d'une archive passée avec --input). Ils sont écrits par lots (un row group
+Parquet par lot) : la mémoire reste bornée par la taille du lot, quel que soit
+le nombre d'années exportées. Filtres --from / --to (dates ISO, bornes
+incluses) et --matiere (insensible à la casse).
+"""
+
+import csv
+import json
+import re
+from pathlib import Path
+from typing import Iterator, Optional
+
+from analytics import parse_note
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow est optionnel : repli sur CSV
+    pa = None
+    pq = None
+
+EXPORT_DIR = Path(__file__).parent / "exports"
+DEFAULT_BATCH_SIZE = 10000
+
+# section -> (champ date, colonnes (nom, type))
+EXPORTS = {
+    "notes": ("date", [
+        ("date", "string"), ("matiere", "string"), ("note", "string"), ("valeur", "float"),
+        ("bareme", "string"), ("coefficient", "float"), ("moyenne_classe", "string"),
+        ("note_min", "string"), ("note_max", "string"), ("commentaire", "string"),
+    ]),
+    "absences": ("date_debut", [
+        ("date_debut", "string"), ("date_fin", "string"), ("justifie", "bool"),
+        ("motif", "string"), ("heures", "float"),
+    ]),
+    "retards": ("date", [
+        ("date", "string"), ("justifie", "bool"), ("motif", "string"), ("minutes", "int"),
+    ]),
+    "lessons": ("debut", [
+        ("id", "string"), ("matiere", "string"), ("professeur", "string"), ("salle", "string"),
+        ("debut", "string"), ("fin", "string"), ("annule", "bool"), ("modifie", "bool"),
+        ("contenu", "string"),
+    ]),
+    "devoirs": ("date_rendu", [
+        ("date_rendu", "string"), ("matiere", "string"), ("description", "string"),
+        ("fait", "bool"), ("fichiers", "string"),
+    ]),
+}
+
+
+def _matches(record: dict, date_field: str, date_from: Optional[str], date_to: Optional[str], matiere: Optional[str]) -> bool:
+    day = (record.get(date_field) or "")[:10]
+    if date_from and day < date_from:
+        return False
+    if date_to and day > date_to:
+        return False
+    if matiere and (record.get("matiere") or "").lower() != matiere.lower():
+        return False
+    return True
+
+
+# Caractères structurants hors chaîne / fin de chaîne ou échappement dans une chaîne
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_STRING_END = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r'[,\]}\s]')
+
+
+class _JsonStream:
+    """
+    Lecture incrémentale d'un fichier JSON : une valeur à la fois, tampon borné.
+    La fin d'un objet, tableau ou chaîne est d'abord repérée par un balayage
+    structurel (profondeur et chaînes, reprise là où il s'était arrêté après
+    chaque lecture), puis la valeur est décodée en une fois ; skip() saute une
+    valeur sans la décoder ni la garder en mémoire.
+    """
+
+    def __init__(self, f, chunk_size: int = 1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"JSON invalide: '{char}' attendu")
+        self.pos += 1
+
+    def _end(self, keep: bool) -> int:
+        """
+        Fin (exclue) de l'objet, tableau ou chaîne commençant à self.pos. Avec
+        keep=False, le texte déjà parcouru est abandonné à chaque lecture.
+        """
+        i = self.pos
+        depth = 0
+        in_string = False
+        while True:
+            if in_string:
+                match = _STRING_END.search(self.buf, i)
+                if match is None:
+                    i = len(self.buf)
+                elif match.group() == "\\":
+                    if match.end() < len(self.buf):
+                        i = match.end() + 1
+                        continue
+                    # Échappement coupé par la fin du tampon : relu après la lecture
+                    i = match.start()
+                else:
+                    in_string = False
+                    i = match.end()
+                    if depth == 0:
+                        return i
+                    continue
+            else:
+                match = _STRUCTURE.search(self.buf, i)
+                if match is None:
+                    i = len(self.buf)
+                else:
+                    i = match.end()
+                    char = match.group()
+                    if char == '"':
+                        in_string = True
+                    elif char in "[{":
+                        depth += 1
+                    else:
+                        depth -= 1
+                        if depth == 0:
+                            return i
+                    continue
+            if not keep:
+                self.pos = i
+            offset = i - self.pos
+            if not self._fill():
+                raise ValueError("JSON invalide: fin de fichier inattendue")
+            i = self.pos + offset
+
+    def skip(self) -> None:
+        """Saute la valeur suivante sans la décoder."""
+        if self.peek() in ('[', '{', '"'):
+            self.pos = self._end(keep=False)
+        else:
+            self.value()
+
+    def value(self):
+        if self.peek() in ('[', '{', '"'):
+            end = self._end(keep=True)
+            value, self.pos = self.decoder.raw_decode(self.buf, self.pos)
+            if self.pos != end:
+                raise ValueError("JSON invalide")
+            return value
+        # Nombre ou littéral : décodé une fois son délimiteur lu (sinon il peut être tronqué)
+        while _SCALAR_END.search(self.buf, self.pos) is None and self._fill():
+            pass
+        value, self.pos = self.decoder.raw_decode(self.buf, self.pos)
+        return value
+
+    def array(self) -> Iterator:
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+def iter_file_section(path: Path, section: str) -> Iterator[dict]:
+    """Enregistrements d'une section d'un fichier data.json, sans charger le fichier."""
+    with open(path, "r", encoding="utf-8") as f:
+        stream = _JsonStream(f)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.value()
+            stream.expect(":")
+            if key == section and stream.peek() == "[":
+                yield from stream.array()
+                return
+            stream.skip()
+            if stream.peek() == ",":
+                stream.pos += 1
+                continue
+            stream.expect("}")
+            return
+
+
+_CASTS = {"string": str, "float": float, "int": int, "bool": bool}
+
+
+def _row(section: str, record: dict) -> dict:
+    """Ligne typée selon le schéma de la section (valeurs absentes -> None)."""
+    row = {}
+    for name, kind in EXPORTS[section][1]:
+        value = record.get(name)
+        try:
+            row[name] = _CASTS[kind](value) if value is not None else None
+        except (TypeError, ValueError):
+            row[name] = None
+    if section == "notes":
+        value = parse_note(record.get("note"))
+        bareme = parse_note(record.get("bareme")) or 20.0
+        row["valeur"] = round(value / bareme * 20, 4) if value is not None else None
+    elif section == "devoirs":
+        row["fichiers"] = "|".join(record.get("fichiers") or [])
+    return row
+
+
+def _batches(records: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _arrow_schema(section: str):
+    types = {"string": pa.string(), "float": pa.float64(), "int": pa.int64(), "bool": pa.bool_()}
+    return pa.schema([(name, types[kind]) for name, kind in EXPORTS[section][1]])
+
+
+def _write_parquet(section: str, batches: Iterator[list[dict]], path: Path) -> tuple[int, int]:
+    schema = _arrow_schema(section)
+    rows = groups = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            rows += len(batch)
+            groups += 1
+    return rows, groups
+
+
+def _write_csv(section: str, batches: Iterator[list[dict]], path: Path) -> tuple[int, int]:
+    columns = [name for name, _ in EXPORTS[section][1]]
+    rows = groups = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for batch in batches:
+            writer.writerows(batch)
+            rows += len(batch)
+            groups += 1
+    return rows, groups
+
+
+def export_section(
+    section: str,
+    records: Iterator[dict],
+    output_dir: Path = EXPORT_DIR,
+    fmt: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    matiere: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> dict:
+    """
+    Filtre et écrit les enregistrements d'une section par lots de batch_size.
+    Les filtres sont réappliqués ici (déjà poussés dans la requête côté Neon).
+    Retourne {"file", "format", "rows", "batches"}.
+    """
+    if section not in EXPORTS:
+        raise ValueError(f"Section non exportable: {section} (disponibles: {', '.join(EXPORTS)})")
+    fmt = fmt or ("parquet" if pq is not None else "csv")
+    if fmt == "parquet" and pq is None:
+        raise RuntimeError("pyarrow requis pour Parquet: pip install pyarrow (ou --format csv)")
+    if fmt not in ("parquet", "csv"):
+        raise ValueError(f"Format inconnu: {fmt}")
+
+    date_field = EXPORTS[section][0]
+    rows = (
+        _row(section, record) for record in records
+        if _matches(record, date_field, date_from, date_to, matiere)
+    )
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / f"{section}.{fmt}"
+    write = _write_parquet if fmt == "parquet" else _write_csv
+    count, groups = write(section, _batches(rows, batch_size), path)
+    return {"file": str(path), "format": fmt, "rows": count, "batches": groups}
+
+
+def export(
+    sections: Optional[list[str]] = None,
+    source: Optional[Path] = None,
+    output_dir: Path = EXPORT_DIR,
+    fmt: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    matiere: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    use_db: bool = False,
+) -> dict:
+    """
+    Exporte les sections demandées (toutes par défaut) depuis Neon (use_db)
+    ou depuis le fichier source. Retourne {section: résumé}.
+    """
+    result = {}
+    for section in sections or list(EXPORTS):
+        if section not in EXPORTS:
+            raise ValueError(f"Section non exportable: {section} (disponibles: {', '.join(EXPORTS)})")
+        if use_db:
+            from db import iter_cache_section
+            records = iter_cache_section(
+                section, EXPORTS[section][0],
+                date_from=date_from, date_to=date_to, matiere=matiere, batch_size=batch_size,
+            )
+        else:
+            records = iter_file_section(source, section)
+        result[section] = export_section(
+            section, records, output_dir, fmt,
+            date_from=date_from, date_to=date_to, matiere=matiere, batch_size=batch_size,
+        )
+    return result
@@ -0,0 +1,783 @@
+"""
+Plan de travail « Focus » calculé côté backend (portage de lib/focus-engine.ts :
+calculateTaskScore, generateFocusPlan, generateWeeklyPlan).
+
+Après chaque rafraîchissement, un plan est calculé pour chacun des
+PLAN_DAYS prochains jours (devoirs, préparations de contrôles et révisions),
+avec la même formule de score que l'UI, et stocké dans le cache (clé "focus").
+Chaque jour est planifié comme si c'était « ce soir » : devoirs non faits
+jusqu'à J + anticipationDays, contrôles jusqu'à J + testPrepDays, révisions
+des matières du lendemain. Les entrées de chaque jour sont réduites puis
+hachées : seuls les jours dont les entrées ont changé sont recalculés, les
+autres reprennent le plan du cache précédent.
+
+Les contrôles et la configuration sont saisis dans le navigateur : à chaque
+modification, l'UI les envoie (POST /api/focus/inputs -> commande
+`focus_inputs`), ils sont écrits dans controles.json et focus_config.json
+(mêmes formats que le localStorage) et le plan est recalculé. Sans ces
+fichiers : aucun contrôle et DEFAULT_CONFIG.
+"""
+
+import copy
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+from bisect import bisect_right
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+from analytics import compute_grade_analytics, normalize_subject
+
+FOCUS_VERSION = 1
+PLAN_DAYS = 7
+
+CONTROLES_FILE = Path(__file__).parent / "controles.json"
+FOCUS_CONFIG_FILE = Path(__file__).parent / "focus_config.json"
+
+DEFAULT_CONFIG = {
+    "maxWorkTimePerNight": 90,
+    "maxSubjectsPerNight": 3,
+    "anticipationDays": 7,
+    "allowWeekendWork": True,
+    "allowOverloadNights": False,
+    "targetAverage": 16,
+    "estimatedTimePerTask": {
+        "homework": 30,
+        "exercise": 20,
+        "revision": 15,
+        "testPrep": 45,
+    },
+    "testPrepDays": 3,
+    "subjectPriorities": {},
+    "disabledRevisionSubjects": [],
+}
+
+# Coefficients de matières (par importance pour le bac STI2D)
+SUBJECT_COEFFICIENTS = {
+    "MATHEMATIQUES": 16,
+    "PHYSIQUE-CHIMIE": 16,
+    "PHYS-CHIMIE TECHNO": 16,
+    "MATHS TECHNO": 16,
+    "INGEN.INNOV.DEV.DUR.": 16,
+    "PHILOSOPHIE": 4,
+    "HISTOIRE-GEOGRAPHIE": 6,
+    "ANGLAIS LV1": 6,
+    "ESPAGNOL LV2": 6,
+    "ED.PHYSIQUE & SPORT.": 6,
+    "ENS. MORAL & CIVIQUE": 2,
+    "ENS. TECH. LV": 4,
+}
+
+MAX_TASKS_PER_NIGHT = 6
+
+_EXERCISE_RE = re.compile(r"ex\.?\s*\d+|exercice\s*n?°?\s*\d+", re.IGNORECASE)
+
+
+# === Utilitaires ===
+
+def _js_round(value: float) -> int:
+    """Math.round de JavaScript (demi vers le haut), différent de round()."""
+    return math.floor(value + 0.5)
+
+
+def _num(value: float):
+    """Entier si la valeur est entière (affichage et JSON identiques à l'UI)."""
+    return int(value) if float(value).is_integer() else value
+
+
+def subject_coefficient(matiere: str) -> int:
+    return SUBJECT_COEFFICIENTS.get(normalize_subject(matiere), 4)
+
+
+def days_until(day: str, today: date) -> Optional[int]:
+    try:
+        return (date.fromisoformat((day or "")[:10]) - today).days
+    except ValueError:
+        return None
+
+
+def _task_id(*parts) -> str:
+    return "focus-" + hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:12]
+
+
+def estimate_task_time(devoir: dict, config: dict):
+    description = (devoir.get("description") or "").lower()
+    times = config["estimatedTimePerTask"]
+    if "dm" in description or "devoir maison" in description:
+        return _num(times["homework"] * 1.5)
+    if "révision" in description or "réviser" in description or "revoir" in description:
+        return times["revision"]
+    if "exercice" in description or "ex." in description or "ex " in description:
+        return max(len(_EXERCISE_RE.findall(description)), 1) * times["exercise"]
+    if "contrôle" in description or "test" in description or "ds" in description:
+        return times["testPrep"]
+    if "apprendre" in description or "leçon" in description:
+        return times["revision"]
+    return times["homework"]
+
+
+# === Analyse des matières (équivalent d'analyzeSubject, à partir de data["analytics"]) ===
+
+def subject_analyses(subjects: list[str], analytics: dict, target_average: float) -> dict:
+    entries = analytics.get("subjects") or {}
+    analyses = {}
+    for subject in subjects:
+        entry = entries.get(subject) or {}
+        moyenne = entry.get("moyenne_eleve")
+        ecart = moyenne - target_average if moyenne is not None else None
+        trend = entry.get("trend", "unknown")
+        needs_attention = (ecart is not None and ecart < -2) or trend == "down" or (moyenne is not None and moyenne < 10)
+        priority = "low"
+        if moyenne is not None:
+            if moyenne < 10 or (ecart is not None and ecart < -4):
+                priority = "high"
+            elif moyenne < 14 or trend == "down":
+                priority = "medium"
+        analyses[subject] = {
+            "matiere": subject,
+            "moyenneEleve": moyenne,
+            "ecartCible": ecart,
+            "trend": trend,
+            "needsAttention": needs_attention,
+            "priority": priority,
+        }
+    return analyses
+
+
+# === Scoring (v2) ===
+
+def _urgency_score(days: int) -> int:
+    if days < 0:
+        return 30
+    if days == 0:
+        return 28
+    if days == 1:
+        return 25
+    if days == 2:
+        return 20
+    if days == 3:
+        return 15
+    if days <= 5:
+        return 10
+    if days <= 7:
+        return 6
+    return max(0, 4 - days // 3)
+
+
+def _importance_score(matiere: str, analysis: Optional[dict]) -> float:
+    score = min(10, _js_round(subject_coefficient(matiere) * 0.625))
+    if analysis:
+        if analysis["ecartCible"] is not None and analysis["ecartCible"] < 0:
+            score += min(10, abs(analysis["ecartCible"]) * 1.67)
+        if analysis["trend"] == "down":
+            score += 5
+    return min(25, score)
+
+
+def _needs_work_score(analysis: Optional[dict]) -> int:
+    if not analysis:
+        return 0
+    score = 0
+    moyenne = analysis["moyenneEleve"]
+    if moyenne is not None:
+        if moyenne < 10:
+            score += 15
+        elif analysis["needsAttention"]:
+            score += 10
+        elif moyenne < 14:
+            score += 5
+    if analysis["trend"] == "down":
+        score += 10
+    elif analysis["trend"] == "stable" and analysis["ecartCible"] is not None and analysis["ecartCible"] < -2:
+        score += 5
+    return min(25, score)
+
+
+def _complexity_score(estimated_time: float, days: int) -> int:
+    if estimated_time <= 20:
+        return 0
+    if estimated_time >= 45 and days >= 3:
+        return 10
+    if estimated_time >= 30 and days >= 3:
+        return 8
+    if estimated_time >= 45 and days >= 2:
+        return 7
+    if estimated_time >= 30 and days >= 2:
+        return 5
+    if estimated_time >= 30 and days >= 1:
+        return 3
+    return 0
+
+
+def _load_adjustment(estimated_time: float, days: int, plan_time: float, plan_count: int, config: dict) -> int:
+    adjustment = 0
+    projected = plan_time + estimated_time
+    if projected > config["maxWorkTimePerNight"]:
+        adjustment -= 10
+    elif projected > config["maxWorkTimePerNight"] * 0.85:
+        adjustment -= 5
+    if plan_count >= 5:
+        adjustment -= 5
+    elif plan_count >= 4:
+        adjustment -= 3
+    if days >= 3 and estimated_time >= 30:
+        adjustment += 8
+    elif days >= 2 and estimated_time >= 25:
+        adjustment += 5
+    elif days >= 2 and estimated_time >= 20:
+        adjustment += 3
+    return max(-10, min(10, adjustment))
+
+
+def _category(days: int, source: str, analysis: Optional[dict]) -> str:
+    if days < 0:
+        return "obligatoire"
+    if source in ("controle", "devoir") and days <= 1:
+        return "obligatoire"
+    if source == "controle" and days <= 3:
+        return "strategique"
+    if analysis and (analysis["needsAttention"] or analysis["trend"] == "down"):
+        return "strategique"
+    if source == "devoir" and days <= 3:
+        return "strategique"
+    if analysis and analysis["moyenneEleve"] is not None and analysis["moyenneEleve"] < 12:
+        return "strategique"
+    return "optionnel"
+
+
+def _level(score: float, category: str) -> str:
+    if category == "obligatoire":
+        return "critical" if score >= 60 else "high"
+    if category == "strategique":
+        return "high" if score >= 50 else "normal"
+    return "normal" if score >= 40 else "optional"
+
+
+def _justifications(days: int, source: str, analysis: Optional[dict], estimated_time: float) -> tuple[str, Optional[str]]:
+    reasons = []
+    if days < 0:
+        reasons.append("⚠️ En retard")
+    elif days == 0:
+        reasons.append("À rendre aujourd'hui")
+    elif days == 1:
+        reasons.append("À rendre demain")
+    elif source == "controle" and days <= 3:
+        reasons.append(f"Contrôle dans {days}j")
+    elif days <= 3:
+        reasons.append(f"Dans {days} jours")
+    if analysis and analysis["moyenneEleve"] is not None and analysis["moyenneEleve"] < 10:
+        reasons.append(f"Moyenne critique ({analysis['moyenneEleve']:.1f}/20)")
+    elif analysis and analysis["needsAttention"]:
+        reasons.append("Matière à améliorer")
+    if analysis and analysis["trend"] == "down":
+        reasons.append("Tendance en baisse")
+    if estimated_time >= 40:
+        reasons.append(f"{_num(estimated_time)}min de travail")
+    if source == "recommendation" and not reasons:
+        reasons.append("Révision recommandée")
+    return (reasons[0] if reasons else "Tâche programmée"), (reasons[1] if len(reasons) > 1 else None)
+
+
+def _priority_reasons(days: int, source: str, analysis: Optional[dict], matiere: str) -> list[dict]:
+    reasons = []
+    if days < 0:
+        reasons.append({"type": "deadline", "label": "En retard !", "urgency": "high"})
+    elif days == 0:
+        reasons.append({"type": "deadline", "label": "Pour aujourd'hui", "urgency": "high"})
+    elif days == 1:
+        reasons.append({"type": "deadline", "label": "Pour demain", "urgency": "high"})
+    elif days <= 3:
+        reasons.append({"type": "deadline", "label": f"Dans {days} jours", "urgency": "medium"})
+    if source == "controle":
+        reasons.append({"type": "test", "label": f"Contrôle dans {days}j", "urgency": "high" if days <= 2 else "medium"})
+    if analysis:
+        if analysis["moyenneEleve"] is not None and analysis["moyenneEleve"] < 10:
+            reasons.append({"type": "lowGrade", "label": f"Moyenne critique ({analysis['moyenneEleve']:.1f}/20)", "urgency": "high"})
+        elif analysis["needsAttention"]:
+            reasons.append({"type": "lowGrade", "label": "Moyenne à améliorer", "urgency": "medium"})
+        if analysis["trend"] == "down":
+            reasons.append({"type": "trend", "label": "Tendance baissière", "urgency": "medium"})
+    if reasons and subject_coefficient(matiere) >= 10:
+        reasons.append({"type": "coefficient", "label": "Matière à fort coefficient", "urgency": "low"})
+    return reasons
+
+
+def _total(components: dict, bonus: float = 0) -> float:
+    raw = components["urgency"] + components["importance"] + components["needsWork"] + components["complexity"] + components["loadAdjustment"] + bonus
+    return max(0, min(100, raw))
+
+
+def calculate_task_score(devoir: dict, analyses: dict, config: dict, today: date, plan_time: float = 0, plan_count: int = 0) -> dict:
+    """Score complet d'un devoir (calculateTaskScore)."""
+    days = days_until(devoir.get("date_rendu"), today)
+    analysis = analyses.get(normalize_subject(devoir.get("matiere", "")))
+    estimated_time = estimate_task_time(devoir, config)
+    components = {
+        "urgency": _urgency_score(days),
+        "importance": _importance_score(devoir.get("matiere", ""), analysis),
+        "needsWork": _needs_work_score(analysis),
+        "complexity": _complexity_score(estimated_time, days),
+        "loadAdjustment": _load_adjustment(estimated_time, days, plan_time, plan_count, config),
+    }
+    score = _total(components)
+    category = _category(days, "devoir", analysis)
+    primary, secondary = _justifications(days, "devoir", analysis, estimated_time)
+    return {
+        "score": score,
+        "components": components,
+        "reasons": _priority_reasons(days, "devoir", analysis, devoir.get("matiere", "")),
+        "category": category,
+        "priorityLevel": _level(score, category),
+        "primaryReason": primary,
+        "secondaryReason": secondary,
+    }
+
+
+# === Tâches ===
+
+def _task_title(devoir: dict) -> str:
+    description = devoir.get("description") or ""
+    desc = description.lower()
+    if "dm" in desc:
+        return "Devoir maison"
+    if "exercice" in desc or "ex." in desc:
+        return "Exercices"
+    if "révision" in desc or "réviser" in desc:
+        return "Révisions"
+    if "apprendre" in desc:
+        return "Leçon à apprendre"
+    if "lire" in desc:
+        return "Lecture"
+    return description[:30] + ("..." if len(description) > 30 else "")
+
+
+def _devoir_task(devoir: dict, result: dict, config: dict) -> dict:
+    desc = (devoir.get("description") or "").lower()
+    task_type = "homework"
+    if "exercice" in desc or "ex." in desc:
+        task_type = "exercise"
+    elif "révision" in desc or "réviser" in desc:
+        task_type = "revision"
+    elif "contrôle" in desc or "test" in desc:
+        task_type = "testPrep"
+    return {
+        "id": _task_id("devoir", devoir.get("matiere"), devoir.get("date_rendu"), devoir.get("description")),
+        "type": task_type,
+        "matiere": normalize_subject(devoir.get("matiere", "")),
+        "title": _task_title(devoir),
+        "description": devoir.get("description") or "",
+        "dueDate": devoir.get("date_rendu"),
+        "estimatedTime": estimate_task_time(devoir, config),
+        "score": result["score"],
+        "scoreComponents": result["components"],
+        "category": result["category"],
+        "priorityLevel": result["priorityLevel"],
+        "primaryReason": result["primaryReason"],
+        "secondaryReason": result["secondaryReason"],
+        "reasons": result["reasons"],
+        "source": "devoir",
+        "originalData": devoir,
+        "completed": bool(devoir.get("fait")),
+    }
+
+
+def _test_prep_task(controle: dict, config: dict, analysis: Optional[dict], today: date) -> dict:
+    days = days_until(controle.get("date"), today)
+    estimated_time = controle.get("dureeRevision") or config["estimatedTimePerTask"]["testPrep"]
+    components = {
+        "urgency": _urgency_score(days),
+        "importance": _importance_score(controle.get("matiere", ""), analysis),
+        "needsWork": _needs_work_score(analysis),
+        "complexity": _complexity_score(estimated_time, days),
+        "loadAdjustment": _load_adjustment(estimated_time, days, 0, 0, config),
+    }
+    score = _total(components, bonus=15)  # bonus contrôle
+    category = _category(days, "controle", analysis)
+    primary, secondary = _justifications(days, "controle", analysis, estimated_time)
+    return {
+        "id": _task_id("controle", controle.get("id"), controle.get("matiere"), controle.get("date")),
+        "type": "testPrep",
+        "matiere": normalize_subject(controle.get("matiere", "")),
+        "title": f"Préparer {(controle.get('type') or '').upper()}",
+        "description": controle.get("description") or f"Révisions pour le contrôle de {controle.get('matiere', '')}",
+        "dueDate": controle.get("date"),
+        "estimatedTime": estimated_time,
+        "score": score,
+        "scoreComponents": components,
+        "category": category,
+        "priorityLevel": _level(score, category),
+        "primaryReason": primary,
+        "secondaryReason": secondary,
+        "reasons": _priority_reasons(days, "controle", analysis, controle.get("matiere", "")),
+        "source": "controle",
+        "originalData": controle,
+        "completed": bool(controle.get("prepCompleted")),
+    }
+
+
+def _revision_recommendation(analysis: dict, config: dict) -> Optional[dict]:
+    moyenne = analysis["moyenneEleve"]
+    if not analysis["needsAttention"] or moyenne is None:
+        return None
+    estimated_time = config["estimatedTimePerTask"]["revision"]
+    components = {
+        "urgency": 0,
+        "importance": _importance_score(analysis["matiere"], analysis),
+        "needsWork": _needs_work_score(analysis),
+        "complexity": 0,
+        "loadAdjustment": 0,
+    }
+    score = min(50, components["importance"] + components["needsWork"])
+    category = "strategique" if moyenne < 10 else "optionnel"
+    primary, secondary = _justifications(-1, "recommendation", analysis, estimated_time)
+    reasons = [{
+        "type": "lowGrade",
+        "label": f"Moyenne: {moyenne:.1f}/20 (cible: {_num(config['targetAverage'])})",
+        "urgency": "high" if moyenne < 10 else "medium",
+    }]
+    if analysis["trend"] == "down":
+        reasons.append({"type": "trend", "label": "Tendance baissière", "urgency": "medium"})
+    return {
+        "id": _task_id("recommendation", analysis["matiere"]),
+        "type": "revision",
+        "matiere": analysis["matiere"],
+        "title": "Révision recommandée",
+        "description": f"Revoir le cours pour améliorer votre moyenne (actuellement {moyenne:.1f}/20)",
+        "estimatedTime": estimated_time,
+        "score": score,
+        "scoreComponents": components,
+        "category": category,
+        "priorityLevel": _level(score, category),
+        "primaryReason": primary,
+        "secondaryReason": secondary,
+        "reasons": reasons,
+        "source": "recommendation",
+        "completed": False,
+    }
+
+
+def _lesson_revision_task(matiere: str, config: dict, analysis: Optional[dict], plan_count: int) -> dict:
+    priority = (config.get("subjectPriorities") or {}).get(matiere, 3)
+    estimated_time = config["estimatedTimePerTask"]["revision"]
+    components = {
+        "urgency": 0,
+        "importance": _importance_score(matiere, analysis),
+        "needsWork": _needs_work_score(analysis),
+        "complexity": 0,
+        "loadAdjustment": _load_adjustment(estimated_time, 7, 0, plan_count, config),
+    }
+    priority_bonus = (priority - 1) * 5
+    score = max(0, min(65, components["importance"] + components["needsWork"] + components["loadAdjustment"] + priority_bonus))
+    return {
+        "id": _task_id("revision", matiere),
+        "type": "revision",
+        "matiere": matiere,
+        "title": "Révision de cours",
+        "description": f"Revoir le cours de {matiere} (pas de travail à rendre)",
+        "estimatedTime": estimated_time,
+        "score": score,
+        "scoreComponents": components,
+        "category": "strategique",
+        "priorityLevel": _level(score, "strategique"),
+        "primaryReason": f"Cours au programme • priorité {priority}/5",
+        "secondaryReason": "Matière à consolider" if analysis and analysis["needsAttention"] else None,
+        "reasons": [{"type": "anticipation", "label": "Révision de cours", "urgency": "low"}],
+        "source": "recommendation",
+        "completed": False,
+    }
+
+
+# === Plan d'une soirée ===
+
+def shared_inputs(data: dict, analytics: dict, config: dict, lesson_days: dict) -> dict:
+    """
+    Entrées communes à tous les jours (matières, analyses, moyenne générale,
+    configuration), réduites une seule fois par rafraîchissement.
+    """
+    devoir_subjects = list(dict.fromkeys(normalize_subject(d.get("matiere", "")) for d in data.get("devoirs") or []))
+    moyenne_subjects = list(dict.fromkeys(normalize_subject(m.get("matiere", "")) for m in data.get("moyennes") or []))
+    lesson_subjects = [s for subjects in lesson_days.values() for s in subjects]
+    subjects = list(dict.fromkeys(moyenne_subjects + devoir_subjects + lesson_subjects))
+    return {
+        "devoir_subjects": devoir_subjects,
+        "moyenne_subjects": moyenne_subjects,
+        "analyses": subject_analyses(subjects, analytics, config["targetAverage"]),
+        "general_average": analytics.get("general_average"),
+        "config": config,
+    }
+
+
+def lesson_subjects_by_day(lessons: list[dict], days: set[str]) -> dict:
+    """{jour: matières des cours du jour} pour les jours demandés, en un seul parcours."""
+    by_day = {day: {} for day in days}
+    for lesson in lessons:
+        subjects = by_day.get((lesson.get("debut") or "")[:10])
+        if subjects is not None:
+            subject = normalize_subject(lesson.get("matiere", ""))
+            if subject:
+                subjects[subject] = None
+    return {day: list(subjects) for day, subjects in by_day.items()}
+
+
+def day_inputs(day: date, pending: list[dict], due_dates: list[str], controles: list[dict], lesson_days: dict, config: dict) -> dict:
+    """
+    Entrées propres au jour `day` : devoirs non faits à rendre avant
+    J + anticipationDays (préfixe de `pending`, trié par date de rendu), contrôles
+    à préparer et matières des cours du lendemain.
+    """
+    limit = (day + timedelta(days=config["anticipationDays"])).isoformat()
+    relevant = pending[:bisect_right(due_dates, limit)]
+    upcoming = []
+    for c in controles:
+        days = days_until(c.get("date"), day)
+        if days is not None and 0 <= days <= config["testPrepDays"] and not c.get("prepCompleted"):
+            upcoming.append(c)
+    return {
+        "date": day.isoformat(),
+        "devoirs": relevant,
+        "controles": upcoming,
+        "lesson_subjects": lesson_days.get((day + timedelta(days=1)).isoformat(), []),
+    }
+
+
+def _inputs_hash(inputs: dict, prefix: str = "") -> str:
+    payload = json.dumps(inputs, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256((prefix + payload).encode("utf-8")).hexdigest()
+
+
+def generate_focus_plan(inputs: dict, shared: dict) -> dict:
+    """Plan d'une soirée (generateFocusPlan) à partir des entrées réduites du jour."""
+    config = shared["config"]
+    today = date.fromisoformat(inputs["date"])
+    analyses = shared["analyses"]
+    disabled = set(config.get("disabledRevisionSubjects") or [])
+
+    tasks = []
+    for d in inputs["devoirs"]:
+        tasks.append(_devoir_task(d, calculate_task_score(d, analyses, config, today), config))
+    for c in inputs["controles"]:
+        tasks.append(_test_prep_task(c, config, analyses.get(normalize_subject(c.get("matiere", ""))), today))
+
+    # Révisions de cours : matières du lendemain (à défaut devoirs/moyennes) sans travail prévu
+    with_task = {t["matiere"] for t in tasks}
+    revision_subjects = inputs["lesson_subjects"] or list(dict.fromkeys(shared["devoir_subjects"] + shared["moyenne_subjects"]))
+    for subject in revision_subjects:
+        if subject in with_task or subject in disabled:
+            continue
+        tasks.append(_lesson_revision_task(subject, config, analyses.get(subject), len(tasks)))
+
+    # Recommandations de révision (matières en difficulté) si peu d'obligatoires
+    obligatoire_count = sum(1 for t in tasks if t["category"] == "obligatoire")
+    if obligatoire_count < 2:
+        needs_attention = [
+            a for a in analyses.values()
+            if a["needsAttention"] and a["priority"] == "high" and a["matiere"] not in disabled
+        ][:max(0, 3 - obligatoire_count)]
+        for analysis in needs_attention:
+            recommendation = _revision_recommendation(analysis, config)
+            if recommendation:
+                tasks.append(recommendation)
+
+    by_category = {
+        category: sorted((t for t in tasks if t["category"] == category), key=lambda t: -t["score"])
+        for category in ("obligatoire", "strategique", "optionnel")
+    }
+
+    selected = []
+    total_time = 0
+    used_subjects = set()
+
+    def try_add(task: dict, force: bool = False) -> bool:
+        nonlocal total_time
+        if not force and total_time + task["estimatedTime"] > config["maxWorkTimePerNight"]:
+            if not config["allowOverloadNights"]:
+                return False
+        if not force and len(used_subjects) >= config["maxSubjectsPerNight"] and task["matiere"] not in used_subjects:
+            return False
+        # Score recalculé avec la charge courante de la soirée
+        days = days_until(task.get("dueDate"), today) if task.get("dueDate") else 7
+        components = task["scoreComponents"]
+        components["loadAdjustment"] = _load_adjustment(task["estimatedTime"], days, total_time, len(selected), config)
+        task["score"] = _total(components)
+        task["priorityLevel"] = _level(task["score"], task["category"])
+        selected.append(task)
+        total_time += task["estimatedTime"]
+        used_subjects.add(task["matiere"])
+        return True
+
+    for task in by_category["obligatoire"]:
+        try_add(task, True)
+        if len(selected) >= MAX_TASKS_PER_NIGHT:
+            break
+    for task in by_category["strategique"]:
+        if len(selected) >= MAX_TASKS_PER_NIGHT:
+            break
+        try_add(task)
+    for task in by_category["optionnel"]:
+        if len(selected) >= MAX_TASKS_PER_NIGHT:
+            break
+        if total_time >= config["maxWorkTimePerNight"] * 0.9:
+            break
+        try_add(task)
+
+    selected_by_category = {
+        category: [t for t in selected if t["category"] == category]
+        for category in ("obligatoire", "strategique", "optionnel")
+    }
+
+    warnings = []
+    is_overloaded = total_time > config["maxWorkTimePerNight"]
+    if is_overloaded:
+        warnings.append(f"Charge élevée ce soir ({int(total_time // 60)}h{str(_num(total_time % 60)).zfill(2)})")
+    late = sum(1 for d in inputs["devoirs"] if days_until(d.get("date_rendu"), today) < 0)
+    if late:
+        warnings.append(f"{late} devoir(s) en retard")
+    missed = len(by_category["obligatoire"]) - len(selected_by_category["obligatoire"])
+    if missed > 0:
+        warnings.append(f"{missed} tâche(s) obligatoire(s) reportée(s)")
+
+    recommendations = []
+    general_average = shared["general_average"]
+    if general_average is not None and general_average < config["targetAverage"]:
+        recommendations.append(
+            f"Objectif: gagner {config['targetAverage'] - general_average:.1f} pts pour atteindre {_num(config['targetAverage'])}/20"
+        )
+    critical = [a["matiere"] for a in analyses.values() if a["priority"] == "high" and a["moyenneEleve"] is not None and a["moyenneEleve"] < 10]
+    if critical:
+        recommendations.append(f"Matières critiques: {', '.join(critical)}")
+
+    return {
+        "date": inputs["date"],
+        "tasks": selected,
+        "tasksByCategory": selected_by_category,
+        "totalTime": total_time,
+        "isOverloaded": is_overloaded,
+        "warnings": warnings,
+        "recommendations": recommendations,
+    }
+
+
+# === Plan de la semaine (incrémental) ===
+
+def load_config(path: Path = FOCUS_CONFIG_FILE) -> dict:
+    """DEFAULT_CONFIG fusionnée avec focus_config.json (comme loadConfig côté UI)."""
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config.update(json.load(f))
+    except (FileNotFoundError, ValueError):
+        pass
+    return config
+
+
+def load_controles(path: Path = CONTROLES_FILE) -> list[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            controles = json.load(f)
+        return controles if isinstance(controles, list) else []
+    except (FileNotFoundError, ValueError):
+        return []
+
+
+def _write_json(path: Path, value) -> None:
+    """Écriture atomique (fichier temporaire voisin puis renommage)."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def save_inputs(
+    controles: Optional[list] = None,
+    config: Optional[dict] = None,
+    controles_path: Path = CONTROLES_FILE,
+    config_path: Path = FOCUS_CONFIG_FILE,
+) -> list[str]:
+    """
+    Enregistre les contrôles et / ou la configuration envoyés par l'UI (None :
+    inchangé). ValueError si le format ne correspond pas au localStorage.
+    Retourne les noms des fichiers écrits.
+    """
+    if controles is not None and not (isinstance(controles, list) and all(isinstance(c, dict) for c in controles)):
+        raise ValueError("controles : liste d'objets attendue")
+    if config is not None and not isinstance(config, dict):
+        raise ValueError("config : objet attendu")
+    written = []
+    if controles is not None:
+        _write_json(controles_path, controles)
+        written.append(controles_path.name)
+    if config is not None:
+        _write_json(config_path, config)
+        written.append(config_path.name)
+    return written
+
+
+def load_previous(data_file: Path) -> Optional[dict]:
+    """Plan stocké dans le cache actuel (Neon : seule la section focus est lue)."""
+    try:
+        from db import use_database
+        if use_database():
+            from db import get_cache_sections
+            text = get_cache_sections(["focus"]).get("focus")
+            return json.loads(text) if text else None
+    except ImportError:
+        pass
+    try:
+        with open(data_file, "r", encoding="utf-8") as f:
+            return json.load(f).get("focus")
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def generate_weekly_plan(
+    data: dict,
+    previous: Optional[dict] = None,
+    controles: Optional[list[dict]] = None,
+    config: Optional[dict] = None,
+    start: Optional[date] = None,
+    days: int = PLAN_DAYS,
+) -> dict:
+    """
+    Plans des `days` prochains jours (generateWeeklyPlan). Un jour dont le hash
+    des entrées est identique à celui du plan précédent n'est pas recalculé.
+    Retourne {"version", "days": [{"date", "hash", "plan"}], "recomputed"}.
+    """
+    config = config if config is not None else load_config()
+    controles = controles if controles is not None else load_controles()
+    start = start or date.today()
+    analytics = data.get("analytics") or compute_grade_analytics(data.get("notes") or [], data.get("moyennes") or [])
+
+    reusable = {}
+    if previous and previous.get("version") == FOCUS_VERSION:
+        reusable = {entry["date"]: entry for entry in previous.get("days") or []}
+
+    dates = [start + timedelta(days=i) for i in range(days)]
+    lesson_days = lesson_subjects_by_day(data.get("lessons") or [], {(d + timedelta(days=1)).isoformat() for d in dates})
+    shared = shared_inputs(data, analytics, config, lesson_days)
+    shared_digest = _inputs_hash(shared)
+    pending = sorted(
+        (d for d in data.get("devoirs") or [] if not d.get("fait") and days_until(d.get("date_rendu"), start) is not None),
+        key=lambda d: d["date_rendu"][:10],
+    )
+    due_dates = [d["date_rendu"][:10] for d in pending]
+
+    entries = []
+    recomputed = []
+    for day in dates:
+        inputs = day_inputs(day, pending, due_dates, controles, lesson_days, config)
+        digest = _inputs_hash(inputs, shared_digest)
+        cached = reusable.get(inputs["date"])
+        if cached and cached.get("hash") == digest:
+            entries.append(cached)
+            continue
+        entries.append({"date": inputs["date"], "hash": digest, "plan": generate_focus_plan(inputs, shared)})
+        recomputed.append(inputs["date"])
+    return {"version": FOCUS_VERSION, "days": entries, "recomputed": recomputed}
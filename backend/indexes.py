@@ -0,0 +1,62 @@
+"""
+Index secondaires construits à chaque rafraîchissement et stockés avec les données
+(clé "indexes"). Chaque index contient des positions dans les tableaux du cache
+(lessons, devoirs, notes) : les widgets du dashboard obtiennent leur tranche
+directement, sans filtrer ni trier les tableaux complets à chaque rendu.
+"""
+
+INDEXES_VERSION = 1
+
+
+def _group(items: list[dict], key, order_key) -> dict[str, list[int]]:
+    """Regroupe les positions par clé, chaque groupe trié selon order_key."""
+    groups: dict[str, list[int]] = {}
+    for i in sorted(range(len(items)), key=lambda i: order_key(items[i])):
+        k = key(items[i])
+        if k:
+            groups.setdefault(k, []).append(i)
+    return groups
+
+
+def build_indexes(data: dict) -> dict:
+    """
+    Construit les index à partir des sections du cache :
+    - lessons_by_day : {AAAA-MM-JJ: [positions triées par heure de début]}
+    - devoirs_by_date : {AAAA-MM-JJ: [positions]}
+    - devoirs_by_matiere : {matiere: [positions triées par date de rendu]}
+    - devoirs_pending : [positions des devoirs non faits, triées par date de rendu]
+    - notes_by_matiere : {matiere: [positions triées par date décroissante]}
+    - notes_by_date : [positions triées par date décroissante]
+    """
+    lessons = data.get("lessons") or []
+    devoirs = data.get("devoirs") or []
+    notes = data.get("notes") or []
+
+    lessons_by_day = _group(
+        lessons,
+        key=lambda l: (l.get("debut") or "")[:10] if l.get("fin") else "",
+        order_key=lambda l: l.get("debut") or "",
+    )
+    devoirs_by_date = _group(devoirs, key=lambda d: d.get("date_rendu") or "", order_key=lambda d: d.get("date_rendu") or "")
+    devoirs_by_matiere = _group(devoirs, key=lambda d: d.get("matiere") or "", order_key=lambda d: d.get("date_rendu") or "")
+    devoirs_pending = [
+        i for i in sorted(range(len(devoirs)), key=lambda i: devoirs[i].get("date_rendu") or "")
+        if not devoirs[i].get("fait")
+    ]
+
+    notes_by_date = sorted(range(len(notes)), key=lambda i: notes[i].get("date") or "", reverse=True)
+    notes_by_matiere: dict[str, list[int]] = {}
+    for i in notes_by_date:
+        matiere = notes[i].get("matiere") or ""
+        if matiere:
+            notes_by_matiere.setdefault(matiere, []).append(i)
+
+    return {
+        "version": INDEXES_VERSION,
+        "lessons_by_day": lessons_by_day,
+        "devoirs_by_date": devoirs_by_date,
+        "devoirs_by_matiere": devoirs_by_matiere,
+        "devoirs_pending": devoirs_pending,
+        "notes_by_matiere": notes_by_matiere,
+        "notes_by_date": notes_by_date,
+    }
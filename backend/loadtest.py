@@ -0,0 +1,394 @@
+"""
+Test de charge du chemin de données : plusieurs dashboards qui rafraîchissent en même temps.
+
+Rejoue un mélange pondéré de requêtes status / status_full / data à une
+concurrence cible, soit en lançant `pronote_client.py <commande>` (cible cli,
+comme route.ts), soit contre le serveur longue durée (cible http, voir server.py).
+Par défaut l'amont Pronote est rejoué depuis l'archive de transport.py.
+
+Usage:
+    python loadtest.py [--target cli|http] [--concurrency 20] [--requests 200]
+                       [--mix status=5,status_full=1,data=2] [--latency 40-120]
+                       [--fixtures archive.json.gz] [--transport replay|record|live]
+                       [--url http://127.0.0.1:8765] [--database-url postgresql://...]
+
+Les processus lancés tournent sur une copie du backend dans un dossier
+temporaire : data.json, search.db, rollups.json, ics_cache.json... y sont
+écrits puis supprimés, jamais dans le backend réel. Une base PostgreSQL n'est
+utilisée que si elle est locale (DATABASE_URL sur localhost / socket) ou
+passée explicitement par --database-url.
+
+Chaque connexion Pronote consomme le jeton et en enregistre un nouveau : en
+amont réel (--transport live ou record), les processus ne peuvent pas partager
+le jeton, la concurrence est donc limitée à 1 et le jeton renouvelé est recopié
+dans le credentials.json du backend. Le mode record réécrit l'archive à la fin
+de chaque processus : il se limite à une seule commande. Pour tester la charge,
+enregistrer d'abord une passe, puis la rejouer :
+    python loadtest.py --transport record --concurrency 1 --requests 1 --mix data=1
+    python loadtest.py --transport replay --concurrency 20 --requests 200
+
+Rapporte : débit, latences p50/p95/p99, nombre de processus, pic de RSS
+et connexions PostgreSQL (si une base est utilisée).
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+from transport import FIXTURES_FILE
+
+BACKEND_DIR = Path(__file__).parent
+SCRIPT = BACKEND_DIR / "pronote_client.py"
+
+DEFAULT_MIX = "status=5,status_full=1,data=2"
+
+# Fichiers de configuration recopiés dans le dossier isolé (les caches ne le sont pas)
+CONFIG_FILES = ("credentials.json", "controles.json", "focus_config.json")
+LOCAL_DB_HOSTS = ("", "localhost", "127.0.0.1", "::1")
+SAMPLE_INTERVAL = 0.05
+
+# Requête HTTP équivalente à chaque commande CLI
+HTTP_ROUTES = {
+    "status": ("GET", "/status"),
+    "status_full": ("GET", "/status/full"),
+    "data": ("POST", "/refresh"),
+    "read": ("GET", "/data"),
+}
+
+
+def parse_mix(value: str) -> list[tuple[str, float]]:
+    mix = []
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in HTTP_ROUTES:
+            raise ValueError(f"Commande inconnue dans --mix: {name}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def percentile(values: list[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return round(ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo), 2)
+
+
+def _rss_kb(pid: int) -> int:
+    """RSS courant d'un processus (Linux), 0 si indisponible."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        pass
+    return 0
+
+
+def _children_maxrss_mb() -> Optional[float]:
+    """ru_maxrss du plus gros processus enfant terminé (Ko sous Linux), None sous Windows."""
+    if sys.platform == "win32":
+        return None
+    import resource
+    return round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+
+
+def _database_host(url: str) -> str:
+    """Hôte d'une URL (postgresql://...) ou d'un DSN clé=valeur ; "" pour un socket local."""
+    if "://" in url:
+        return urlsplit(url).hostname or ""
+    for part in url.split():
+        key, _, value = part.partition("=")
+        if key == "host":
+            return "" if value.startswith("/") else value
+    return ""
+
+
+def _isolated_backend(workdir: Path) -> Path:
+    """Copie le code du backend et sa configuration dans workdir ; retourne le script à lancer."""
+    for path in BACKEND_DIR.glob("*.py"):
+        shutil.copy2(path, workdir / path.name)
+    for name in CONFIG_FILES:
+        if (BACKEND_DIR / name).exists():
+            shutil.copy2(BACKEND_DIR / name, workdir / name)
+    return workdir / SCRIPT.name
+
+
+def _restore_credentials(workdir: Path) -> None:
+    """Recopie dans le backend le jeton renouvelé par les connexions à l'amont réel."""
+    rotated = workdir / "credentials.json"
+    original = BACKEND_DIR / "credentials.json"
+    if rotated.exists() and (not original.exists() or rotated.read_bytes() != original.read_bytes()):
+        shutil.copy2(rotated, original)
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.pids: set[int] = set()
+        self.processes_started = 0
+        self.peak_processes = 0
+        self.peak_rss_kb = 0
+        self.db_samples: list[int] = []
+
+    def add(self, command: str, latency_ms: float, ok: bool) -> None:
+        self.latencies.setdefault(command, []).append(latency_ms)
+        if not ok:
+            self.errors[command] = self.errors.get(command, 0) + 1
+
+
+def _db_connection_count(conn) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()")
+        return int(cur.fetchone()[0]) - 1  # sans la connexion d'échantillonnage
+
+
+async def sampler(stats: Stats, stop: asyncio.Event, database: bool) -> None:
+    """Échantillonne processus vivants, RSS cumulée et connexions PostgreSQL."""
+    db_conn = None
+    if database:
+        try:
+            from db import _connect
+            db_conn = _connect()
+        except Exception as e:
+            print(f"[loadtest] Connexions DB non mesurées: {e}", file=sys.stderr)
+    loop = asyncio.get_running_loop()
+    try:
+        while not stop.is_set():
+            alive = [pid for pid in list(stats.pids) if _rss_kb(pid)]
+            stats.peak_processes = max(stats.peak_processes, len(alive))
+            stats.peak_rss_kb = max(stats.peak_rss_kb, sum(_rss_kb(pid) for pid in alive))
+            if db_conn is not None:
+                stats.db_samples.append(await loop.run_in_executor(None, _db_connection_count, db_conn))
+            try:
+                await asyncio.wait_for(stop.wait(), SAMPLE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        if db_conn is not None:
+            db_conn.close()
+
+
+async def run_cli(command: str, script: Path, env: dict, stats: Stats) -> bool:
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, str(script), command,
+        cwd=str(script.parent), env=env,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    stats.pids.add(proc.pid)
+    stats.processes_started += 1
+    stdout, _ = await proc.communicate()
+    stats.pids.discard(proc.pid)
+    if proc.returncode != 0:
+        return False
+    try:
+        result = json.loads(stdout)
+    except ValueError:
+        return False
+    return "error" not in result
+
+
+async def run_http(command: str, host: str, port: int) -> bool:
+    method, path = HTTP_ROUTES[command]
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nAccept-Encoding: gzip\r\nConnection: close\r\nContent-Length: 0\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    lines = head.split(b"\r\n")
+    parts = lines[0].split()
+    if len(parts) < 2 or parts[1] != b"200":
+        return False
+    if any(line.lower() == b"content-encoding: gzip" for line in lines[1:]):
+        body = gzip.decompress(body)
+    try:
+        result = json.loads(body)
+    except ValueError:
+        return False
+    return not (isinstance(result, dict) and "error" in result)
+
+
+async def _wait_for_port(host: str, port: int, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Serveur injoignable sur {host}:{port}")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _run(
+    target: str, commands: list[str], concurrency: int, options: dict, script: Path, env: dict, database: bool
+) -> tuple[Stats, float]:
+    """Joue les commandes (processus lancés depuis script.parent) ; retourne stats et durée."""
+    stats = Stats()
+    server_proc = None
+    host, port = "127.0.0.1", 0
+    if target == "http":
+        if "url" in options:
+            url = urlsplit(options["url"])
+            host, port = url.hostname, url.port or 80
+        else:
+            port = _free_port()
+            server_proc = await asyncio.create_subprocess_exec(
+                sys.executable, str(script), "serve", "--port", str(port),
+                cwd=str(script.parent), env=env,
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+            )
+            stats.pids.add(server_proc.pid)
+            stats.processes_started += 1
+        await _wait_for_port(host, port)
+
+    stop = asyncio.Event()
+    sampler_task = asyncio.create_task(sampler(stats, stop, database))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(command: str) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if target == "cli":
+                    ok = await run_cli(command, script, env, stats)
+                else:
+                    ok = await run_http(command, host, port)
+            except (OSError, asyncio.IncompleteReadError):
+                ok = False
+            stats.add(command, (time.perf_counter() - start) * 1000, ok)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(c) for c in commands))
+    finally:
+        duration = time.perf_counter() - started
+        stop.set()
+        await sampler_task
+        if server_proc is not None:
+            server_proc.terminate()
+            await server_proc.wait()
+    return stats, duration
+
+
+async def load_test(options: dict) -> dict:
+    target = options.get("target", "cli")
+    concurrency = int(options.get("concurrency", 20))
+    total = int(options.get("requests", 200))
+    mix = parse_mix(options.get("mix", DEFAULT_MIX))
+    rng = random.Random(int(options.get("seed", 42)))
+    commands = rng.choices([m[0] for m in mix], weights=[m[1] for m in mix], k=total)
+    if target == "cli" and "read" in commands:
+        raise ValueError("La commande 'read' n'existe qu'en cible http")
+
+    database_url = options.get("database_url") or os.environ.get("DATABASE_URL", "")
+    if "database_url" not in options and database_url and _database_host(database_url) not in LOCAL_DB_HOSTS:
+        raise ValueError(
+            "DATABASE_URL pointe vers une base distante : le test écrirait dans son cache. "
+            "Utiliser une base locale ou la passer explicitement avec --database-url"
+        )
+
+    transport = options.get("transport", "replay")
+    if transport not in ("replay", "record", "live"):
+        raise ValueError(f"Transport inconnu: {transport} (replay, record, live)")
+    if transport != "replay" and concurrency > 1:
+        raise ValueError(
+            f"--transport {transport} : jeton Pronote à usage unique, concurrence limitée à 1 "
+            "(enregistrer une passe avec --transport record, puis la rejouer avec --transport replay)"
+        )
+    if transport == "record" and (target != "cli" or total > 1):
+        raise ValueError("--transport record : une seule commande en cible cli (--requests 1), l'archive est réécrite par chaque processus")
+
+    env = dict(os.environ, PYTHONIOENCODING="utf-8")
+    env.pop("DATABASE_URL", None)
+    if database_url:
+        env["DATABASE_URL"] = os.environ["DATABASE_URL"] = database_url
+    if transport != "live":
+        env["PRONOTE_TRANSPORT"] = transport
+    # Chemin absolu : les processus tournent dans le dossier isolé
+    env["PRONOTE_FIXTURES"] = str(Path(options.get("fixtures") or FIXTURES_FILE).resolve())
+    if "latency" in options:
+        env["PRONOTE_REPLAY_LATENCY_MS"] = options["latency"]
+
+    with tempfile.TemporaryDirectory(prefix="pronote-loadtest-") as workdir:
+        script = _isolated_backend(Path(workdir))
+        try:
+            stats, duration = await _run(target, commands, concurrency, options, script, env, bool(database_url))
+        finally:
+            if transport != "replay":
+                _restore_credentials(Path(workdir))
+
+    all_latencies = [v for values in stats.latencies.values() for v in values]
+    return {
+        "target": target,
+        "transport": transport,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": sum(stats.errors.values()),
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(total / duration, 2) if duration else None,
+        "latency_ms": {
+            "p50": percentile(all_latencies, 50),
+            "p95": percentile(all_latencies, 95),
+            "p99": percentile(all_latencies, 99),
+            "max": round(max(all_latencies), 2) if all_latencies else None,
+        },
+        "by_command": {
+            name: {
+                "count": len(values),
+                "errors": stats.errors.get(name, 0),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+            }
+            for name, values in stats.latencies.items()
+        },
+        "processes": {
+            "started": stats.processes_started,
+            "peak_concurrent": stats.peak_processes,
+        },
+        "rss_mb": {
+            "peak_total": round(stats.peak_rss_kb / 1024, 1),
+            "peak_single": _children_maxrss_mb(),
+        },
+        "db_connections": {
+            "peak": max(stats.db_samples) if stats.db_samples else None,
+            "mean": round(sum(stats.db_samples) / len(stats.db_samples), 2) if stats.db_samples else None,
+        },
+    }
+
+
+def main():
+    from pronote_client import _parse_options
+    _, options = _parse_options(sys.argv[1:])
+    try:
+        report = asyncio.run(load_test(options))
+    except (ValueError, RuntimeError) as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Journalisation du backend vers stderr (stdout est réservé au JSON).
+
+Niveaux via PRONOTE_LOG_LEVEL (DEBUG, INFO, WARNING, ERROR, OFF ; défaut WARNING :
+silencieux en production hors erreurs). Le formatage est paresseux : message,
+arguments %s et données ne sont formatés que si le niveau est actif.
+En mode synchrone (défaut) la ligne est écrite directement sur le flux, sans
+LogRecord ni Formatter ; PRONOTE_LOG_ASYNC=1 passe par logging, une file et
+un thread dédié.
+Les champs sensibles (jetons, mots de passe, uuid) sont masqués.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
+DEFAULT_LEVEL = "WARNING"
+
+# Clés masquées dans les données journalisées (comparaison insensible à la casse)
+REDACTED_KEYS = {"password", "jeton", "token", "uuid", "cle", "challenge", "qr_json", "pin"}
+REDACTED = "***"
+
+_logger = logging.getLogger("pronote")
+_configured = False
+# Écriture directe en mode synchrone (None en mode file)
+_writer = None
+
+
+def _redact(value):
+    if isinstance(value, dict):
+        return {
+            k: (REDACTED if isinstance(k, str) and k.lower() in REDACTED_KEYS and v else _redact(v))
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [_redact(v) for v in value]
+    return value
+
+
+class _Lazy:
+    """Données formatées (et masquées) uniquement à l'émission ; accepte un callable."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self) -> str:
+        value = self.value() if callable(self.value) else self.value
+        return str(_redact(value))
+
+
+class _Formatter(logging.Formatter):
+    """Horodatage recalculé au plus une fois par seconde."""
+
+    def __init__(self):
+        super().__init__("[%(asctime)s.%(msecs)03d] [Python] %(levelname)s %(message)s")
+        self._second = None
+        self._stamp = ""
+
+    def formatTime(self, record, datefmt=None) -> str:
+        second = int(record.created)
+        if second != self._second:
+            self._second = second
+            self._stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        return self._stamp
+
+
+class _DirectWriter:
+    """
+    Mode synchrone : même ligne que _Formatter, écrite sans passer par
+    makeRecord / Handler / Formatter (l'essentiel du coût d'un appel actif).
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+        self._second = None
+        self._stamp = ""
+
+    def write(self, level: int, message: str, args: tuple, exc_info: bool) -> None:
+        if args:
+            try:
+                message = message % args
+            except (TypeError, ValueError):
+                message = f"{message} {args!r}"
+        now = time.time()
+        second = int(now)
+        with self.lock:
+            if second != self._second:
+                self._second = second
+                self._stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+            line = f"[{self._stamp}.{int((now - second) * 1000):03d}] [Python] {logging.getLevelName(level)} {message}\n"
+            if exc_info:
+                line += traceback.format_exc()
+            try:
+                self.stream.write(line)
+                self.stream.flush()
+            except (OSError, ValueError):
+                pass
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Enfile l'enregistrement brut : le formatage se fait dans le thread d'écriture."""
+
+    def prepare(self, record):
+        return record
+
+
+def configure(level=None, use_queue=None, stream=None) -> None:
+    """Configure le logger (appelé automatiquement au premier import)."""
+    global _configured, _writer
+    if level is None:
+        level = os.environ.get("PRONOTE_LOG_LEVEL", DEFAULT_LEVEL)
+    if use_queue is None:
+        use_queue = os.environ.get("PRONOTE_LOG_ASYNC", "") in ("1", "true")
+    if isinstance(level, str):
+        level = logging.CRITICAL + 10 if level.upper() == "OFF" else getattr(logging, level.upper(), logging.WARNING)
+
+    for handler in list(_logger.handlers):
+        _logger.removeHandler(handler)
+        listener = getattr(handler, "listener", None)
+        if listener is not None:
+            atexit.unregister(listener.stop)
+            listener.stop()
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(_Formatter())
+    if use_queue:
+        q = queue.SimpleQueue()
+        queue_handler = _QueueHandler(q)
+        queue_handler.listener = logging.handlers.QueueListener(q, handler)
+        queue_handler.listener.start()
+        atexit.register(queue_handler.listener.stop)
+        handler = queue_handler
+    _logger.addHandler(handler)
+    _writer = None if use_queue else _DirectWriter(stream or sys.stderr)
+    _logger.setLevel(level)
+    _logger.propagate = False
+    _configured = True
+
+
+def enabled(level: int = DEBUG) -> bool:
+    return _logger.isEnabledFor(level)
+
+
+def _emit(level: int, message: str, args: tuple, data, exc_info: bool) -> None:
+    if not _logger.isEnabledFor(level):
+        return
+    if data is not None:
+        # Sans arguments, le message n'est pas un format : ses % restent littéraux
+        message = f"{message if args else message.replace('%', '%%')}: %s"
+        args = args + (_Lazy(data),)
+    if _writer is not None:
+        _writer.write(level, message, args, exc_info)
+        return
+    # makeRecord + handle : évite la recherche de l'appelant (findCaller) de Logger.log
+    record = _logger.makeRecord(_logger.name, level, "", 0, message, args, sys.exc_info() if exc_info else None)
+    _logger.handle(record)
+
+
+def debug(message: str, *args, data=None, exc_info: bool = False) -> None:
+    _emit(DEBUG, message, args, data, exc_info)
+
+
+def info(message: str, *args, data=None, exc_info: bool = False) -> None:
+    _emit(INFO, message, args, data, exc_info)
+
+
+def warning(message: str, *args, data=None, exc_info: bool = False) -> None:
+    _emit(WARNING, message, args, data, exc_info)
+
+
+def error(message: str, *args, data=None, exc_info: bool = False) -> None:
+    _emit(ERROR, message, args, data, exc_info)
+
+
+if not _configured:
+    configure()
@@ -7,7 +7,7 @@ import json
 import sys
 import io
 import uuid as uuid_module
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from typing import Optional
 from dataclasses import dataclass, asdict
@@ -15,6 +15,8 @@ from dataclasses import dataclass, asdict
 import pronotepy
 from pronotepy import *
 
+from logger import debug as log, enabled as log_enabled, error as log_error, warning as log_warning
+
 # Forcer l'encodage UTF-8 pour stdout et stderr sur Windows
 if sys.platform == "win32":
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
@@ -33,13 +35,92 @@ def _use_db():
         return False
 
 
-def log(message: str, data=None):
-    """Log avec timestamp vers stderr pour ne pas polluer stdout (JSON)"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-    if data is not None:
-        print(f"[{timestamp}] [Python] {message}: {data}", file=sys.stderr)
-    else:
-        print(f"[{timestamp}] [Python] {message}", file=sys.stderr)
+def _transport_mode():
+    """Mode d'enregistrement/rejeu des echanges Pronote (voir transport.py)"""
+    from transport import mode
+    return mode()
+
+
+# Sections du cache recuperees depuis Pronote (absences et retards : un seul appel)
+SECTIONS = ("eleve", "devoirs", "notes", "moyennes", "lessons", "menus", "discussions", "absences", "retards")
+
+# Sections datees : champ date, fenetre par defaut (jours avant, jours apres aujourd'hui)
+DATED_SECTIONS = {
+    "devoirs": ("date_rendu", 7, 30),
+    "lessons": ("debut", 0, 7),
+    "menus": ("date", 0, 14),
+}
+
+# Sections calculees apres recuperation -> sections dont elles dependent
+DERIVED_SECTIONS = {
+    "analytics": ("notes", "moyennes"),
+    "indexes": ("lessons", "devoirs", "notes"),
+    "timetable": ("lessons",),
+    "focus": ("devoirs", "notes", "moyennes", "lessons"),
+}
+
+
+def select_sections(names: list[str]) -> list[str]:
+    """Valide une liste de sections (ValueError si inconnue), dans l'ordre de SECTIONS."""
+    unknown = [name for name in names if name not in SECTIONS]
+    if unknown:
+        raise ValueError(f"Sections inconnues: {', '.join(unknown)} (disponibles: {', '.join(SECTIONS)})")
+    if not names:
+        raise ValueError("Aucune section demandee")
+    return [name for name in SECTIONS if name in names]
+
+
+def parse_window(date_from: Optional[str], date_to: Optional[str]) -> tuple[Optional[date], Optional[date]]:
+    """Bornes --from / --to en dates ISO (ValueError si invalides ou inversees)."""
+    start = date.fromisoformat(date_from) if date_from else None
+    end = date.fromisoformat(date_to) if date_to else None
+    if start and end and start > end:
+        raise ValueError("--from doit preceder --to")
+    return start, end
+
+
+def section_window(name: str, date_from: Optional[date] = None, date_to: Optional[date] = None) -> tuple[date, date]:
+    """Periode recuperee pour une section datee : bornes explicites, sinon fenetre par defaut."""
+    _, jours_avant, jours_apres = DATED_SECTIONS[name]
+    today = datetime.now().date()
+    return date_from or today - timedelta(days=jours_avant), date_to or today + timedelta(days=jours_apres)
+
+
+def merge_dated_section(name: str, cached: list[dict], fresh: list[dict], window: tuple[date, date]) -> list[dict]:
+    """Remplace dans `cached` les elements de la periode `window` par `fresh` (tri par date)."""
+    field = DATED_SECTIONS[name][0]
+    lo, hi = window[0].isoformat(), window[1].isoformat()
+    kept = [item for item in cached if not lo <= (item.get(field) or "")[:10] <= hi]
+    return sorted(kept + fresh, key=lambda item: item.get(field) or "")
+
+
+def _load_cached_sections(names: list[str]) -> dict:
+    """Sections du cache actuel (Neon : seules celles demandees sont lues)."""
+    if not names:
+        return {}
+    if _use_db():
+        from db import get_cache_sections
+        return {name: json.loads(text) for name, text in get_cache_sections(names).items()}
+    if not DATA_FILE.exists():
+        return {}
+    with open(DATA_FILE, "r", encoding="utf-8") as f:
+        cache = json.load(f)
+    return {name: cache[name] for name in names if name in cache}
+
+
+def _save_cache_sections(sections: dict) -> None:
+    """Ecrit les seules sections fournies dans le cache (Neon ou fichier), les autres sont conservees."""
+    if _use_db():
+        from db import set_cache_sections
+        set_cache_sections(sections)
+        return
+    cache = {}
+    if DATA_FILE.exists():
+        with open(DATA_FILE, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    cache.update(sections)
+    with open(DATA_FILE, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
 
 
 @dataclass
@@ -50,6 +131,7 @@ class Devoir:
     date_rendu: str
     fait: bool
     fichiers: list[str]
+    id: str = ""
     
     def to_dict(self) -> dict:
         return asdict(self)
@@ -159,9 +241,12 @@ class Retard:
 class PronoteClient:
     """Client complet pour interagir avec Pronote"""
     
-    def __init__(self):
+    def __init__(self, pool_size: Optional[int] = None):
         self.client: Optional[pronotepy.Client] = None
         self.connected = False
+        # Pool de sessions (voir session_pool.py), cree a la connexion si taille > 1
+        self.pool_size = pool_size
+        self.pool = None
     
     def check_credentials_exist(self) -> dict:
         """
@@ -176,7 +261,7 @@ class PronoteClient:
                 if not creds:
                     log("Aucun credentials en base (Neon)")
                     return {"connected": False, "error": "Aucun token sauvegarde"}
-                log("Credentials lus (Neon)", {
+                log("Credentials lus (Neon)", data=lambda: {
                     "url": (creds.get("url") or "")[:50] + "...",
                     "username": creds.get("username"),
                     "has_password": bool(creds.get("password")),
@@ -185,12 +270,12 @@ class PronoteClient:
                 required = ["url", "username", "password", "uuid"]
                 for field in required:
                     if not creds.get(field):
-                        log(f"Champ manquant: {field}")
+                        log("Champ manquant: %s", field)
                         return {"connected": False, "error": f"Champ manquant: {field}"}
                 log("Credentials valides")
                 return {"connected": True, "credentials_exist": True}
             except Exception as e:
-                log(f"Erreur lecture credentials (Neon): {e}")
+                log_error("Erreur lecture credentials (Neon): %s", e)
                 return {"connected": False, "error": str(e)}
         
         if not CREDENTIALS_FILE.exists():
@@ -201,7 +286,7 @@ class PronoteClient:
             with open(CREDENTIALS_FILE, "r", encoding="utf-8") as f:
                 creds = json.load(f)
             
-            log("Credentials lus", {
+            log("Credentials lus", data=lambda: {
                 "url": creds.get("url", "")[:50] + "...",
                 "username": creds.get("username"),
                 "has_password": bool(creds.get("password")),
@@ -212,13 +297,13 @@ class PronoteClient:
             required = ["url", "username", "password", "uuid"]
             for field in required:
                 if not creds.get(field):
-                    log(f"Champ manquant: {field}")
+                    log("Champ manquant: %s", field)
                     return {"connected": False, "error": f"Champ manquant: {field}"}
             
             log("Credentials valides")
             return {"connected": True, "credentials_exist": True}
         except Exception as e:
-            log(f"Erreur lecture credentials: {e}")
+            log_error("Erreur lecture credentials: %s", e)
             return {"connected": False, "error": str(e)}
     
     def connect_with_token(self) -> dict:
@@ -234,14 +319,14 @@ class PronoteClient:
                 from db import get_credentials
                 creds = get_credentials()
             except Exception as e:
-                log(f"Erreur lecture credentials Neon: {e}")
+                log_error("Erreur lecture credentials Neon: %s", e)
                 return {"connected": False, "error": str(e)}
         elif CREDENTIALS_FILE.exists():
             try:
                 with open(CREDENTIALS_FILE, "r", encoding="utf-8") as f:
                     creds = json.load(f)
             except Exception as e:
-                log(f"Erreur lecture credentials: {e}")
+                log_error("Erreur lecture credentials: %s", e)
                 return {"connected": False, "error": str(e)}
         
         if not creds:
@@ -250,7 +335,7 @@ class PronoteClient:
         
         try:
             original_url = creds["url"]
-            log("Credentials chargés", {
+            log("Credentials chargés", data=lambda: {
                 "url_original": original_url[:100] + "..." if len(original_url) > 100 else original_url,
                 "username": creds["username"],
                 "password_length": len(creds.get("password", "")),
@@ -268,7 +353,7 @@ class PronoteClient:
             else:
                 url = original_url + "?login=true"
             
-            log(f"URL pour token_login: {url}")
+            log("URL pour token_login: %s", url)
             log("Tentative de connexion avec token_login...")
             
             self.client = pronotepy.Client.token_login(
@@ -278,51 +363,44 @@ class PronoteClient:
                 creds["uuid"]
             )
             
-            log(f"Connexion établie, logged_in = {self.client.logged_in}")
+            log("Connexion établie, logged_in = %s", self.client.logged_in)
             
             if self.client.logged_in:
                 self.connected = True
                 
                 log("Mise à jour des credentials avec nouveau token")
-                log(f"Nouveau username: {self.client.username}")
-                log(f"Nouveau password length: {len(self.client.password)}")
+                log("Nouveau username: %s", self.client.username)
+                log("Nouveau password length: %s", len(self.client.password))
                 
                 # Sauvegarder les nouveaux credentials pour la prochaine fois
-                if _use_db():
-                    from db import set_credentials
-                    set_credentials(
-                        creds["url"],
-                        self.client.username,
-                        self.client.password,
-                        creds["uuid"]
+                self._save_token(creds["url"], creds["uuid"], self.client.username, self.client.password)
+                
+                from session_pool import SessionPool, pool_size
+                size = pool_size(self.pool_size)
+                if size > 1:
+                    # Les sessions supplementaires partent du jeton qui vient d'etre emis
+                    self.pool = SessionPool(
+                        url, creds["uuid"], self.client.username, self.client.password,
+                        size=size,
+                        on_rotate=lambda username, password: self._save_token(creds["url"], creds["uuid"], username, password),
+                        client=self.client,
                     )
-                    log("Credentials sauvegardés (Neon)")
-                else:
-                    new_creds = {
-                        "url": creds["url"],
-                        "username": self.client.username,
-                        "password": self.client.password,
-                        "uuid": creds["uuid"]
-                    }
-                    with open(CREDENTIALS_FILE, "w", encoding="utf-8") as f:
-                        json.dump(new_creds, f, indent=2)
-                    log("Credentials sauvegardés")
+                    log("Pool de sessions: %s", size)
                 eleve_info = self.get_info_eleve()
-                log("Info élève récupérées", eleve_info)
+                log("Info élève récupérées", data=eleve_info)
                 
                 return {
                     "connected": True,
                     "eleve": eleve_info
                 }
             
-            log("Connexion échouée - logged_in = False")
+            log_warning("Connexion échouée - logged_in = False")
             return {"connected": False, "error": "Token invalide ou expire", "token_expired": True}
             
         except Exception as e:
             error_msg = str(e)
-            log(f"Exception lors de la connexion: {error_msg}")
-            import traceback
-            log(f"Traceback: {traceback.format_exc()}")
+            log_error("Exception lors de la connexion: %s", error_msg)
+            log("Traceback", exc_info=True)
             
             # Detecter les erreurs de token expire
             if "Page html is different" in error_msg or "token" in error_msg.lower():
@@ -330,6 +408,28 @@ class PronoteClient:
                 return {"connected": False, "error": "Token expire - veuillez vous reconnecter", "token_expired": True}
             return {"connected": False, "error": error_msg}
     
+    def _save_token(self, url: str, device_uuid: str, username: str, password: str) -> None:
+        """
+        Sauvegarde le jeton emis par la derniere connexion (appele aussi par le
+        pool a chaque rotation). Sauf en rejeu : le jeton vient de l'archive.
+        """
+        if _transport_mode() == "replay":
+            log("Rejeu: credentials non sauvegardés")
+        elif _use_db():
+            from db import set_credentials
+            set_credentials(url, username, password, device_uuid)
+            log("Credentials sauvegardés (Neon)")
+        else:
+            new_creds = {
+                "url": url,
+                "username": username,
+                "password": password,
+                "uuid": device_uuid
+            }
+            with open(CREDENTIALS_FILE, "w", encoding="utf-8") as f:
+                json.dump(new_creds, f, indent=2)
+            log("Credentials sauvegardés")
+    
     def connect_with_qrcode(self, qr_json: str, pin: str) -> dict:
         """
         Se connecte avec les donnees du QR code
@@ -338,8 +438,8 @@ class PronoteClient:
         Retourne un dict avec le statut
         """
         log("=== CONNECT WITH QRCODE ===")
-        log(f"QR JSON reçu (longueur: {len(qr_json)})")
-        log(f"PIN reçu (longueur: {len(pin)})")
+        log("QR JSON reçu (longueur: %s)", len(qr_json))
+        log("PIN reçu (longueur: %s)", len(pin))
         
         try:
             # Nettoyer et parser le JSON
@@ -349,7 +449,7 @@ class PronoteClient:
             log("Parsing du QR JSON...")
             qr_data = json.loads(qr_json)
             
-            log("QR Data parsé", {
+            log("QR Data parsé", data=lambda: {
                 "jeton": qr_data.get("jeton", "")[:20] + "..." if qr_data.get("jeton") else None,
                 "login": qr_data.get("login"),
                 "url": qr_data.get("url"),
@@ -358,25 +458,25 @@ class PronoteClient:
             
             # Generer un UUID unique pour cet appareil
             device_uuid = str(uuid_module.uuid4())
-            log(f"UUID généré: {device_uuid}")
+            log("UUID généré")
             
             log("Tentative de connexion avec qrcode_login...")
             self.client = pronotepy.Client.qrcode_login(qr_data, pin, device_uuid)
             
-            log(f"Connexion établie, logged_in = {self.client.logged_in}")
+            log("Connexion établie, logged_in = %s", self.client.logged_in)
             
             if self.client.logged_in:
                 self.connected = True
                 
-                log(f"Username du client: {self.client.username}")
-                log(f"Password du client (longueur): {len(self.client.password)}")
+                log("Username du client: %s", self.client.username)
+                log("Password du client (longueur): %s", len(self.client.password))
                 
                 # Recuperer l'URL correcte depuis le client (pas celle du QR code)
                 # pronotepy stocke l'URL dans client.pronote_url
                 pronote_url = getattr(self.client, 'pronote_url', None)
                 
-                log(f"pronote_url from client: {pronote_url}")
-                log(f"qr_data url: {qr_data.get('url', '')}")
+                log("pronote_url from client: %s", pronote_url)
+                log("qr_data url: %s", qr_data.get('url', ''))
                 
                 # IMPORTANT: Utiliser l'URL complète du client (avec paramètres fd et bydlg)
                 # Ces paramètres sont NECESSAIRES pour token_login
@@ -385,13 +485,13 @@ class PronoteClient:
                 if pronote_url:
                     # Utiliser l'URL du client telle quelle
                     final_url = pronote_url
-                    log(f"Utilisation de l'URL du client (complète)")
+                    log("Utilisation de l'URL du client (complète)")
                 else:
                     # Fallback sur l'URL du QR code
                     final_url = qr_data.get("url", "")
-                    log(f"Fallback sur l'URL du QR code")
+                    log("Fallback sur l'URL du QR code")
                 
-                log(f"URL finale à sauvegarder: {final_url}")
+                log("URL finale à sauvegarder: %s", final_url)
                 
                 # Sauvegarder les credentials pour les prochaines connexions
                 creds = {
@@ -402,7 +502,9 @@ class PronoteClient:
                 }
                 
                 log("Sauvegarde des credentials...")
-                if _use_db():
+                if _transport_mode() == "replay":
+                    log("Rejeu: credentials non sauvegardés")
+                elif _use_db():
                     from db import set_credentials
                     set_credentials(
                         final_url, self.client.username, self.client.password, device_uuid
@@ -412,10 +514,10 @@ class PronoteClient:
                     with open(CREDENTIALS_FILE, "w", encoding="utf-8") as f:
                         json.dump(creds, f, indent=2)
                     log("Credentials sauvegardés avec succès")
-                    if CREDENTIALS_FILE.exists():
+                    if log_enabled() and CREDENTIALS_FILE.exists():
                         with open(CREDENTIALS_FILE, "r", encoding="utf-8") as f:
                             saved_creds = json.load(f)
-                        log("Vérification credentials sauvegardés", {
+                        log("Vérification credentials sauvegardés", data=lambda: {
                             "url": saved_creds.get("url", "")[:50] + "...",
                             "username": saved_creds.get("username"),
                             "password_length": len(saved_creds.get("password", ""))
@@ -428,26 +530,25 @@ class PronoteClient:
                     data = self.get_all_data()
                     log("Données récupérées et sauvegardées avec succès")
                 except Exception as e:
-                    log(f"Erreur récupération données: {e}")
+                    log_error("Erreur récupération données: %s", e)
                 
                 eleve_info = self.get_info_eleve()
-                log("Info élève", eleve_info)
+                log("Info élève", data=eleve_info)
                 
                 return {
                     "connected": True,
                     "eleve": eleve_info
                 }
             
-            log("Connexion échouée - logged_in = False")
+            log_warning("Connexion échouée - logged_in = False")
             return {"connected": False, "error": "Connexion echouee - verifiez le PIN"}
             
         except json.JSONDecodeError as e:
-            log(f"Erreur parsing JSON: {e}")
+            log_error("Erreur parsing JSON: %s", e)
             return {"connected": False, "error": "Format JSON du QR code invalide"}
         except Exception as e:
-            log(f"Exception: {e}")
-            import traceback
-            log(f"Traceback: {traceback.format_exc()}")
+            log_error("Exception: %s", e)
+            log("Traceback", exc_info=True)
             return {"connected": False, "error": str(e)}
     
     def logout(self) -> dict:
@@ -458,6 +559,9 @@ class PronoteClient:
                 delete_credentials()
             elif CREDENTIALS_FILE.exists():
                 CREDENTIALS_FILE.unlink()
+            if self.pool is not None:
+                self.pool.close()
+                self.pool = None
             self.client = None
             self.connected = False
             return {"success": True}
@@ -480,8 +584,14 @@ class PronoteClient:
         except Exception as e:
             return {"error": str(e)}
     
-    def get_devoirs(self, jours_avant: int = 7, jours_apres: int = 30) -> list[Devoir]:
-        """Recupere les devoirs sur une periode donnee"""
+    def get_devoirs(
+        self,
+        jours_avant: int = 7,
+        jours_apres: int = 30,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+    ) -> list[Devoir]:
+        """Recupere les devoirs sur une periode donnee (date_from / date_to priment sur les jours)"""
         if not self._check_connection():
             return []
         
@@ -489,8 +599,8 @@ class PronoteClient:
         
         try:
             # Utiliser .date() pour éviter les erreurs de comparaison datetime vs date
-            date_debut = (datetime.now() - timedelta(days=jours_avant)).date()
-            date_fin = (datetime.now() + timedelta(days=jours_apres)).date()
+            date_debut = date_from or (datetime.now() - timedelta(days=jours_avant)).date()
+            date_fin = date_to or (datetime.now() + timedelta(days=jours_apres)).date()
             
             homework = self.client.homework(date_from=date_debut, date_to=date_fin)
             
@@ -500,12 +610,13 @@ class PronoteClient:
                     description=hw.description or "",
                     date_rendu=hw.date.strftime("%Y-%m-%d") if hw.date else "",
                     fait=hw.done,
-                    fichiers=[f.name for f in hw.files] if hw.files else []
+                    fichiers=[f.name for f in hw.files] if hw.files else [],
+                    id=getattr(hw, "id", "") or ""
                 )
                 devoirs.append(devoir)
             
         except Exception as e:
-            print(f"[ERREUR] Devoirs: {e}", file=sys.stderr)
+            log_error("Devoirs: %s", e)
         
         return devoirs
     
@@ -534,7 +645,7 @@ class PronoteClient:
                         notes.append(note)
             
         except Exception as e:
-            print(f"[ERREUR] Notes: {e}", file=sys.stderr)
+            log_error("Notes: %s", e)
         
         return notes
     
@@ -559,12 +670,18 @@ class PronoteClient:
                         moyennes.append(moyenne)
             
         except Exception as e:
-            print(f"[ERREUR] Moyennes: {e}", file=sys.stderr)
+            log_error("Moyennes: %s", e)
         
         return moyennes
     
-    def get_lessons(self, jours_avant: int = 0, jours_apres: int = 7) -> list[Lesson]:
-        """Recupere l'emploi du temps sur une periode donnee"""
+    def get_lessons(
+        self,
+        jours_avant: int = 0,
+        jours_apres: int = 7,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+    ) -> list[Lesson]:
+        """Recupere l'emploi du temps sur une periode donnee (date_from / date_to priment sur les jours)"""
         if not self._check_connection():
             return []
         
@@ -572,8 +689,8 @@ class PronoteClient:
         
         try:
             # Utiliser .date() pour éviter les erreurs de comparaison
-            date_debut = (datetime.now() - timedelta(days=jours_avant)).date()
-            date_fin = (datetime.now() + timedelta(days=jours_apres)).date()
+            date_debut = date_from or (datetime.now() - timedelta(days=jours_avant)).date()
+            date_fin = date_to or (datetime.now() + timedelta(days=jours_apres)).date()
             
             cours = self.client.lessons(date_from=date_debut, date_to=date_fin)
             
@@ -602,11 +719,17 @@ class PronoteClient:
                 lessons.append(lesson)
             
         except Exception as e:
-            print(f"[ERREUR] Lessons: {e}", file=sys.stderr)
+            log_error("Lessons: %s", e)
         
         return lessons
     
-    def get_menus(self, jours_avant: int = 0, jours_apres: int = 14) -> list[Menu]:
+    def get_menus(
+        self,
+        jours_avant: int = 0,
+        jours_apres: int = 14,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+    ) -> list[Menu]:
         """Recupere les menus de la cantine"""
         if not self._check_connection():
             return []
@@ -615,8 +738,8 @@ class PronoteClient:
         
         try:
             # Utiliser .date() pour éviter les erreurs de comparaison datetime vs date
-            date_debut = (datetime.now() - timedelta(days=jours_avant)).date()
-            date_fin = (datetime.now() + timedelta(days=jours_apres)).date()
+            date_debut = date_from or (datetime.now() - timedelta(days=jours_avant)).date()
+            date_fin = date_to or (datetime.now() + timedelta(days=jours_apres)).date()
             
             menus_data = self.client.menus(date_from=date_debut, date_to=date_fin)
             
@@ -632,7 +755,7 @@ class PronoteClient:
                 menus.append(menu)
             
         except Exception as e:
-            print(f"[ERREUR] Menus: {e}", file=sys.stderr)
+            log_error("Menus: %s", e)
         
         return menus
     
@@ -659,7 +782,7 @@ class PronoteClient:
                 discussions.append(discussion)
             
         except Exception as e:
-            print(f"[ERREUR] Discussions: {e}", file=sys.stderr)
+            log_error("Discussions: %s", e)
         
         return discussions
     
@@ -698,40 +821,165 @@ class PronoteClient:
                             retards.append(retard)
             
         except Exception as e:
-            print(f"[ERREUR] Absences: {e}", file=sys.stderr)
+            log_error("Absences: %s", e)
         
         return absences, retards
     
-    def get_all_data(self) -> dict:
-        """Recupere toutes les donnees et les retourne en JSON"""
+    def _current_period_window(self) -> Optional[tuple[str, str]]:
+        """Bornes (ISO) de la periode actuelle, celle des notes, absences et retards recuperes"""
+        try:
+            period = self.client.current_period
+            return str(period.start)[:10], str(period.end)[:10]
+        except Exception:
+            return None
+    
+    def get_all_data(
+        self,
+        sections: Optional[list[str]] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+    ) -> dict:
+        """
+        Recupere les donnees et les retourne en JSON.
+        Sans `sections` : toutes les sections, cache reecrit en entier.
+        Avec `sections` : seuls ces getters sont appeles ; pour les sections
+        datees, seule la periode [date_from, date_to] (fenetre par defaut de la
+        section sinon) est remplacee dans le cache, le reste est conserve. Les
+        sections derivees (analytics, indexes, timetable, focus) dependant des
+        sections rafraichies sont recalculees ; seules les sections modifiees
+        sont ecrites.
+        """
+        selected = select_sections(sections) if sections is not None else list(SECTIONS)
         if not self._check_connection():
             return {"error": "Non connecte"}
+        windows = {name: section_window(name, date_from, date_to) for name in DATED_SECTIONS}
         
-        absences, retards = self.get_absences()
-        
-        data = {
-            "export_date": datetime.now().isoformat(),
-            "eleve": self.get_info_eleve(),
-            "devoirs": [d.to_dict() for d in self.get_devoirs()],
-            "notes": [n.to_dict() for n in self.get_notes()],
-            "moyennes": [m.to_dict() for m in self.get_moyennes()],
-            "lessons": [l.to_dict() for l in self.get_lessons()],
-            "menus": [m.to_dict() for m in self.get_menus()],
-            "discussions": [d.to_dict() for d in self.get_discussions()],
-            "absences": [a.to_dict() for a in absences],
-            "retards": [r.to_dict() for r in retards]
+        fetchers = {
+            "eleve": lambda c: c.get_info_eleve(),
+            "devoirs": lambda c: [d.to_dict() for d in c.get_devoirs(date_from=windows["devoirs"][0], date_to=windows["devoirs"][1])],
+            "notes": lambda c: [n.to_dict() for n in c.get_notes()],
+            "moyennes": lambda c: [m.to_dict() for m in c.get_moyennes()],
+            "lessons": lambda c: [l.to_dict() for l in c.get_lessons(date_from=windows["lessons"][0], date_to=windows["lessons"][1])],
+            "menus": lambda c: [m.to_dict() for m in c.get_menus(date_from=windows["menus"][0], date_to=windows["menus"][1])],
+            "discussions": lambda c: [d.to_dict() for d in c.get_discussions()],
+            "absences": lambda c: c.get_absences(),
         }
+        # Absences et retards : un seul appel Pronote
+        wanted = {"absences" if name == "retards" else name for name in selected}
+        fetchers = {name: fetch for name, fetch in fetchers.items() if name in wanted}
+        if self.pool is not None:
+            # Sections recuperees en parallele, une session du pool chacune
+            fetched = self.pool.run({
+                name: (lambda session, fetch=fetch: fetch(self._on_session(session)))
+                for name, fetch in fetchers.items()
+            })
+            log("Pool de sessions", data=self.pool.stats())
+        else:
+            fetched = {name: fetch(self) for name, fetch in fetchers.items()}
+        if "absences" in fetched:
+            absences, retards = fetched.pop("absences")
+            fetched["absences"] = [a.to_dict() for a in absences]
+            fetched["retards"] = [r.to_dict() for r in retards]
         
-        # Sauvegarder (Neon ou fichier)
-        if _use_db():
-            from db import set_cache
-            set_cache(data)
+        data = {"export_date": datetime.now().isoformat()}
+        data.update((name, fetched[name]) for name in SECTIONS if name in selected)
+        # Periodes reellement recuperees : les index derives ne purgent que la-dedans
+        fetch_windows = {name: (lo.isoformat(), hi.isoformat()) for name, (lo, hi) in windows.items() if name in data}
+        period = self._current_period_window()
+        if period is not None:
+            fetch_windows.update((name, period) for name in ("notes", "absences", "retards") if name in data)
+        
+        if sections is None:
+            view = data
+            derived = list(DERIVED_SECTIONS)
         else:
-            with open(DATA_FILE, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            # Rafraichissement partiel : sections du cache utiles a la fusion et aux calculs derives
+            derived = [name for name, deps in DERIVED_SECTIONS.items() if any(dep in data for dep in deps)]
+            needed = {dep for name in derived for dep in DERIVED_SECTIONS[name]} | (set(data) & set(DATED_SECTIONS))
+            cached = _load_cached_sections(sorted(needed))
+            for name in set(data) & set(DATED_SECTIONS):
+                data[name] = merge_dated_section(name, cached.get(name) or [], data[name], windows[name])
+            view = {**cached, **data}
+            log("Rafraîchissement partiel", data={"sections": selected, "derivees": derived, "periodes": {
+                name: [w.isoformat() for w in windows[name]] for name in data if name in DATED_SECTIONS
+            }})
+        
+        # Analyses des notes precalculees (moyennes, tendances, notes requises)
+        if "analytics" in derived:
+            try:
+                from analytics import compute_grade_analytics
+                view["analytics"] = data["analytics"] = compute_grade_analytics(view.get("notes") or [], view.get("moyennes") or [])
+            except Exception as e:
+                log_error("Erreur analyses des notes: %s", e)
+        
+        # Index secondaires (cours par jour, devoirs par date/matiere, notes par matiere/date)
+        if "indexes" in derived:
+            try:
+                from indexes import build_indexes
+                data["indexes"] = build_indexes(view)
+            except Exception as e:
+                log_error("Erreur construction des index: %s", e)
+
+        # Index d'intervalles de l'emploi du temps (creneaux libres, chevauchements, prochain cours)
+        if "timetable" in derived:
+            try:
+                from timetable import build_timetable
+                data["timetable"] = build_timetable(view.get("lessons") or [])
+            except Exception as e:
+                log_error("Erreur index emploi du temps: %s", e)
+
+        # Plan Focus des 7 prochains jours (seuls les jours dont les entrees ont change sont recalcules)
+        if "focus" in derived:
+            try:
+                from focus import generate_weekly_plan, load_previous
+                focus = generate_weekly_plan(view, previous=load_previous(DATA_FILE))
+                log("Plan Focus calculé", data={"recomputed": focus.pop("recomputed")})
+                data["focus"] = focus
+            except Exception as e:
+                log_error("Erreur plan Focus: %s", e)
+
+        # Sauvegarder (Neon ou fichier) : tout le cache, ou seulement les sections recalculees
+        if sections is None:
+            if _use_db():
+                from db import set_cache
+                set_cache(data)
+            else:
+                with open(DATA_FILE, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+        else:
+            _save_cache_sections(data)
+        
+        # Index plein texte (devoirs, contenu des cours, discussions)
+        try:
+            from search import update_index
+            stats = update_index(data, fetch_windows)
+            log("Index de recherche mis à jour", data=stats)
+        except Exception as e:
+            log_error("Erreur index de recherche: %s", e)
+        
+        # Agregats par (semaine, matiere) : absences, retards, notes
+        try:
+            from rollups import update as update_rollups
+            log("Agrégats mis à jour", data=update_rollups(data, fetch_windows))
+        except Exception as e:
+            log_error("Erreur agrégats: %s", e)
+        
+        # Flux iCalendar (fragments par semaine reconstruits si modifies)
+        try:
+            from calendar_feed import update as update_calendar
+            log("Flux iCalendar mis à jour", data=update_calendar(data, windows=fetch_windows))
+        except Exception as e:
+            log_error("Erreur flux iCalendar: %s", e)
         
         return data
     
+    def _on_session(self, session: pronotepy.Client) -> "PronoteClient":
+        """Vue de ce client sur une session du pool (memes getters)"""
+        view = PronoteClient()
+        view.client = session
+        view.connected = True
+        return view
+    
     def _check_connection(self) -> bool:
         """Verifie que le client est connecte"""
         return self.connected and self.client is not None
@@ -765,13 +1013,33 @@ class PronoteClient:
 
 
 # === CLI Interface ===
+def _parse_options(args: list[str]) -> tuple[list[str], dict]:
+    """Separe les arguments positionnels des options --cle valeur"""
+    positional = []
+    options = {}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg.startswith("--"):
+            key = arg[2:].replace("-", "_")
+            if i + 1 < len(args) and not args[i + 1].startswith("--"):
+                options[key] = args[i + 1]
+                i += 2
+                continue
+            options[key] = "true"
+        else:
+            positional.append(arg)
+        i += 1
+    return positional, options
+
+
 def main():
     """Interface CLI pour le script"""
     log("=== PRONOTE CLIENT CLI ===")
-    log(f"Arguments: {sys.argv}")
-    log(f"Dossier de travail: {Path.cwd()}")
-    log(f"Fichier credentials: {CREDENTIALS_FILE}")
-    log(f"Fichier data: {DATA_FILE}")
+    log("Arguments: %s", sys.argv[1:2])
+    log("Dossier de travail: %s", Path.cwd())
+    log("Fichier credentials: %s", CREDENTIALS_FILE)
+    log("Fichier data: %s", DATA_FILE)
     
     if len(sys.argv) < 2:
         print("Usage: python pronote_client.py <command> [args]")
@@ -779,11 +1047,25 @@ def main():
         print("  status          - Verifier le statut de connexion")
         print("  connect_qr      - Connexion via QR code (args: qr_json pin)")
         print("  logout          - Deconnexion")
-        print("  data            - Recuperer toutes les donnees")
+        print("  data            - Recuperer les donnees (options: --pool-size N --sections devoirs,lessons,... --from AAAA-MM-JJ --to AAAA-MM-JJ)")
+        print("  listen          - Flux SSE des invalidations du cache (Neon)")
+        print("  search          - Recherche plein texte (args: requete [--page N] [--per-page N] [--section S])")
+        print("  serve           - Serveur HTTP du cache avec ETag (options: --host H --port P)")
+        print("  ics             - Calendrier iCalendar cours + devoirs (options: --output fichier)")
+        print("  timetable       - Requetes emploi du temps (args: free|next|now|overlaps|clashes|canceled options: --date --at --from --to --start HH:MM --end HH:MM --min N)")
+        print("  rollups         - Agregats absences/retards/notes (options: --by day|week|month|subject --from --to --matiere --total)")
+        print("  focus_inputs    - Enregistrer controles / config Focus (JSON {controles, config} sur stdin) et recalculer le plan")
+        print("  export          - Export Parquet/CSV (args: [sections] options: --from --to --matiere --format --output --input --batch-size)")
         sys.exit(1)
     
     command = sys.argv[1]
-    log(f"Commande: {command}")
+    log("Commande: %s", command)
+    
+    # Enregistrement / rejeu des echanges Pronote (PRONOTE_TRANSPORT=record|replay)
+    from transport import configure
+    transport_mode = configure()
+    if transport_mode:
+        log("Transport Pronote: %s", transport_mode)
     
     client = PronoteClient()
     
@@ -791,14 +1073,14 @@ def main():
         log("Exécution: status (vérification rapide)")
         # Verification rapide (sans connexion reseau)
         result = client.check_credentials_exist()
-        log("Résultat status", result)
+        log("Résultat status", data=result)
         print(json.dumps(result, ensure_ascii=False))
     
     elif command == "status_full":
         log("Exécution: status_full (avec connexion)")
         # Verification complete avec connexion a Pronote
         result = client.connect_with_token()
-        log("Résultat status_full", result)
+        log("Résultat status_full", data=result)
         print(json.dumps(result, ensure_ascii=False))
     
     elif command == "connect_qr":
@@ -809,7 +1091,7 @@ def main():
         qr_json = sys.argv[2]
         pin = sys.argv[3]
         result = client.connect_with_qrcode(qr_json, pin)
-        log("Résultat connect_qr", {"connected": result.get("connected")})
+        log("Résultat connect_qr", data={"connected": result.get("connected")})
         print(json.dumps(result, ensure_ascii=False))
     
     elif command == "connect_qr_file":
@@ -819,44 +1101,54 @@ def main():
             print(json.dumps({"connected": False, "error": "Argument manquant: fichier temporaire"}))
             sys.exit(1)
         temp_file = sys.argv[2]
-        log(f"Lecture fichier temporaire: {temp_file}")
+        log("Lecture fichier temporaire: %s", temp_file)
         try:
             with open(temp_file, "r", encoding="utf-8") as f:
                 data = json.load(f)
             qr_json = data.get("qr_json", "")
             pin = data.get("pin", "")
-            log(f"Données lues: qr_json={len(qr_json)} chars, pin={len(pin)} chars")
+            log("Données lues: qr_json=%s chars, pin=%s chars", len(qr_json), len(pin))
             result = client.connect_with_qrcode(qr_json, pin)
-            log("Résultat connect_qr_file", {"connected": result.get("connected")})
+            log("Résultat connect_qr_file", data={"connected": result.get("connected")})
             print(json.dumps(result, ensure_ascii=False))
         except Exception as e:
-            log(f"Erreur lecture fichier: {e}")
-            import traceback
-            log(f"Traceback: {traceback.format_exc()}")
+            log_error("Erreur lecture fichier: %s", e)
+            log("Traceback", exc_info=True)
             print(json.dumps({"connected": False, "error": f"Erreur lecture fichier: {e}"}))
             sys.exit(1)
     
     elif command == "logout":
         log("Exécution: logout")
         result = client.logout()
-        log("Résultat logout", result)
+        log("Résultat logout", data=result)
         print(json.dumps(result, ensure_ascii=False))
     
     elif command == "data":
         log("Exécution: data")
+        _, options = _parse_options(sys.argv[2:])
+        try:
+            if "pool_size" in options:
+                client.pool_size = int(options["pool_size"])
+                if client.pool_size < 1:
+                    raise ValueError("--pool-size doit etre >= 1")
+            sections = select_sections([n for n in options["sections"].split(",") if n]) if "sections" in options else None
+            date_from, date_to = parse_window(options.get("from"), options.get("to"))
+        except ValueError as e:
+            print(json.dumps({"error": str(e)}))
+            sys.exit(1)
         # D'abord se connecter
         log("Tentative de connexion avec token...")
         connect_result = client.connect_with_token()
-        log("Résultat connexion", connect_result)
+        log("Résultat connexion", data=connect_result)
         
         if not connect_result.get("connected"):
-            log("Échec de connexion - retour erreur")
+            log_warning("Échec de connexion - retour erreur")
             print(json.dumps({"error": "Non connecte", "details": connect_result}))
             sys.exit(1)
         
         log("Connexion réussie, récupération des données...")
-        data = client.get_all_data()
-        log("Données récupérées", {
+        data = client.get_all_data(sections, date_from, date_to)
+        log("Données récupérées", data=lambda: {
             "export_date": data.get("export_date"),
             "eleve": data.get("eleve", {}).get("nom"),
             "notes_count": len(data.get("notes", [])),
@@ -864,8 +1156,175 @@ def main():
         })
         print(json.dumps(data, ensure_ascii=False))
     
+    elif command == "listen":
+        log("Exécution: listen")
+        # Relaye les NOTIFY du cache au format SSE (un evenement par invalidation)
+        if not _use_db():
+            print(json.dumps({"error": "listen requiert DATABASE_URL (Neon)"}))
+            sys.exit(1)
+        from db import listen_cache_updates
+        try:
+            for event in listen_cache_updates(timeout=15.0):
+                if event:
+                    sys.stdout.write(f"event: cache\ndata: {json.dumps(event, ensure_ascii=False)}\n\n")
+                else:
+                    sys.stdout.write(": keep-alive\n\n")
+                sys.stdout.flush()
+        except KeyboardInterrupt:
+            pass
+    
+    elif command == "search":
+        log("Exécution: search")
+        positional, options = _parse_options(sys.argv[2:])
+        if not positional:
+            print(json.dumps({"error": "Argument manquant: requete"}))
+            sys.exit(1)
+        from search import search
+        try:
+            result = search(
+                " ".join(positional),
+                page=int(options.get("page", 1)),
+                per_page=int(options.get("per_page", 10)),
+                section=options.get("section"),
+            )
+        except Exception as e:
+            log_error("Erreur recherche: %s", e)
+            print(json.dumps({"error": str(e)}))
+            sys.exit(1)
+        print(json.dumps(result, ensure_ascii=False))
+    
+    elif command == "ics":
+        log("Exécution: ics")
+        _, options = _parse_options(sys.argv[2:])
+        from calendar_feed import load_cache, render, update as update_calendar
+        cache = load_cache()
+        if not cache["weeks"]:
+            # Premier appel : construire les fragments depuis le cache de donnees
+            cached_data = None
+            if _use_db():
+                from db import get_cache
+                cached_data = get_cache()
+            elif DATA_FILE.exists():
+                with open(DATA_FILE, "r", encoding="utf-8") as f:
+                    cached_data = json.load(f)
+            if cached_data:
+                update_calendar(cached_data)
+                cache = load_cache()
+        log("Hash du flux: %s", cache["hash"])
+        calendar = render(cache)
+        if "output" in options:
+            with open(options["output"], "w", encoding="utf-8", newline="") as f:
+                f.write(calendar)
+            print(json.dumps({"output": options["output"], "hash": cache["hash"]}))
+        else:
+            sys.stdout.write(calendar)
+    
+    elif command == "rollups":
+        log("Exécution: rollups")
+        _, options = _parse_options(sys.argv[2:])
+        from rollups import query as query_rollups
+        try:
+            result = query_rollups(
+                by=options.get("by", "week"),
+                date_from=options.get("from"),
+                date_to=options.get("to"),
+                matiere=options.get("matiere"),
+                total=options.get("total") == "true",
+            )
+        except Exception as e:
+            log_error("Erreur agrégats: %s", e)
+            print(json.dumps({"error": str(e)}))
+            sys.exit(1)
+        print(json.dumps(result, ensure_ascii=False))
+    
+    elif command == "timetable":
+        log("Exécution: timetable")
+        positional, options = _parse_options(sys.argv[2:])
+        import timetable
+        query = positional[0] if positional else "free"
+        now = datetime.now().isoformat(timespec="seconds")
+        try:
+            lessons, index = timetable.load(DATA_FILE)
+            if query == "free":
+                result = timetable.free_slots(
+                    index, lessons, options.get("date", now[:10]),
+                    day_start=options.get("start", timetable.DAY_START),
+                    day_end=options.get("end", timetable.DAY_END),
+                    min_minutes=int(options.get("min", 0)),
+                )
+            elif query == "next":
+                result = timetable.next_lesson(index, lessons, options.get("at", now))
+            elif query == "now":
+                result = timetable.at(index, lessons, options.get("at", now))
+            elif query in ("overlaps", "clashes"):
+                result = timetable.overlaps(index, lessons, options.get("from"), options.get("to"), same_room=query == "clashes")
+            elif query == "canceled":
+                result = timetable.canceled(index, lessons, options.get("from"), options.get("to"))
+            else:
+                raise ValueError(f"Requête inconnue: {query} (free, next, now, overlaps, clashes, canceled)")
+        except Exception as e:
+            log_error("Erreur emploi du temps: %s", e)
+            print(json.dumps({"error": str(e)}))
+            sys.exit(1)
+        print(json.dumps(result, ensure_ascii=False))
+    
+    elif command == "focus_inputs":
+        log("Exécution: focus_inputs")
+        from focus import generate_weekly_plan, save_inputs
+        try:
+            payload = json.load(sys.stdin)
+            if not isinstance(payload, dict):
+                raise ValueError("objet JSON {controles, config} attendu")
+            saved = save_inputs(payload.get("controles"), payload.get("config"))
+        except ValueError as e:
+            print(json.dumps({"error": str(e)}))
+            sys.exit(1)
+        # Plan Focus recalcule depuis le cache avec les nouvelles entrees
+        result = {"saved": saved, "recomputed": []}
+        cached = _load_cached_sections(list(DERIVED_SECTIONS["focus"]) + ["analytics", "focus"])
+        if any(cached.get(name) for name in DERIVED_SECTIONS["focus"]):
+            focus = generate_weekly_plan(cached, previous=cached.get("focus"))
+            result["recomputed"] = focus.pop("recomputed")
+            _save_cache_sections({"focus": focus})
+        log("Entrées Focus enregistrées", data=result)
+        print(json.dumps(result, ensure_ascii=False))
+    
+    elif command == "export":
+        log("Exécution: export")
+        positional, options = _parse_options(sys.argv[2:])
+        from export import DEFAULT_BATCH_SIZE, EXPORT_DIR, export
+        # Une archive explicite (--input) prime sur le stockage courant
+        use_db = "input" not in options and _use_db()
+        source = Path(options.get("input", DATA_FILE))
+        if not use_db and not source.exists():
+            print(json.dumps({"error": f"Aucune donnée à exporter: {source}"}))
+            sys.exit(1)
+        try:
+            result = export(
+                positional or None,
+                source=source,
+                output_dir=Path(options.get("output", EXPORT_DIR)),
+                fmt=options.get("format"),
+                date_from=options.get("from"),
+                date_to=options.get("to"),
+                matiere=options.get("matiere"),
+                batch_size=int(options.get("batch_size", DEFAULT_BATCH_SIZE)),
+                use_db=use_db,
+            )
+        except Exception as e:
+            log_error("Erreur export: %s", e)
+            print(json.dumps({"error": str(e)}))
+            sys.exit(1)
+        print(json.dumps(result, ensure_ascii=False))
+    
+    elif command == "serve":
+        log("Exécution: serve")
+        _, options = _parse_options(sys.argv[2:])
+        from server import run
+        run(options.get("host"), int(options["port"]) if "port" in options else None)
+    
     else:
-        log(f"Commande inconnue: {command}")
+        log_warning("Commande inconnue: %s", command)
         print(json.dumps({"error": f"Commande inconnue: {command}"}))
         sys.exit(1)
     
@@ -0,0 +1,310 @@
+"""
+Agrégats matérialisés par (semaine ISO, matière) : heures d'absence, minutes de
+retard, nombre de notes et sommes pondérées (note sur 20 × coefficient).
+
+Deux niveaux sont maintenus : des lignes par (jour, matière), source de la mise
+à jour incrémentale, et des lignes par (semaine, matière) recalculées seulement
+pour les semaines dont un jour a changé. À chaque rafraîchissement, les jours
+de la période réellement récupérée (par type : notes, absences, retards,
+fournie par l'appelant) sont remplacés et l'historique hors période est
+conservé : les agrégats survivent aux changements de période, sans jamais
+relire les enregistrements.
+
+Absences et retards n'ont pas de matière dans Pronote : ils sont agrégés sous
+la matière "". Table pronote_rollups si DATABASE_URL est défini, sinon
+rollups.json à côté de data.json.
+"""
+
+import json
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+from analytics import normalize_subject, parse_note
+
+ROLLUPS_FILE = Path(__file__).parent / "rollups.json"
+ROLLUPS_VERSION = 1
+
+# Type d'enregistrement -> (section du cache, champ date, colonnes agrégées)
+KINDS = {
+    "notes": ("notes", "date", ("notes_count", "weighted_sum", "coef_total")),
+    "absences": ("absences", "date_debut", ("absence_hours", "absence_count")),
+    "retards": ("retards", "date", ("delay_minutes", "delay_count")),
+}
+FIELDS = tuple(field for _, _, fields in KINDS.values() for field in fields)
+
+GRAINS = ("day", "week")
+
+
+def _week(day: str) -> str:
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _empty() -> dict:
+    return {field: 0 for field in FIELDS}
+
+
+def _contributions(data: dict) -> dict:
+    """Valeurs par (jour, matière) pour chaque type présent dans les données."""
+    buckets: dict[str, dict] = {kind: {} for kind in KINDS}
+    for kind, (section, date_field, _) in KINDS.items():
+        for record in data.get(section) or []:
+            day = (record.get(date_field) or "")[:10]
+            if not day:
+                continue
+            if kind == "notes":
+                value = parse_note(record.get("note"))
+                if value is None:
+                    continue
+                bareme = parse_note(record.get("bareme")) or 20.0
+                coef = float(record.get("coefficient") or 1.0)
+                values = buckets[kind].setdefault((day, normalize_subject(record.get("matiere", ""))), {})
+                values["notes_count"] = values.get("notes_count", 0) + 1
+                values["weighted_sum"] = values.get("weighted_sum", 0.0) + value / bareme * 20 * coef
+                values["coef_total"] = values.get("coef_total", 0.0) + coef
+            elif kind == "absences":
+                values = buckets[kind].setdefault((day, ""), {})
+                values["absence_hours"] = values.get("absence_hours", 0.0) + float(record.get("heures") or 0)
+                values["absence_count"] = values.get("absence_count", 0) + 1
+            else:
+                values = buckets[kind].setdefault((day, ""), {})
+                values["delay_minutes"] = values.get("delay_minutes", 0) + int(record.get("minutes") or 0)
+                values["delay_count"] = values.get("delay_count", 0) + 1
+    for kind_buckets in buckets.values():
+        for values in kind_buckets.values():
+            for field in ("weighted_sum", "coef_total", "absence_hours"):
+                if field in values:
+                    values[field] = round(values[field], 4)
+    return buckets
+
+
+def _is_empty(values: dict) -> bool:
+    return not any(values.get(field) for field in FIELDS)
+
+
+def plan(rows: dict, data: dict, windows: Optional[dict] = None) -> tuple[dict, list]:
+    """
+    Applique un rafraîchissement aux lignes existantes
+    ({"day": {(jour, matière): valeurs}, "week": {(semaine, matière): valeurs}}),
+    modifiées en place. `windows` donne, par type, la période récupérée
+    ({"notes": (début, fin), ...} en dates ISO) : les jours de cette période
+    absents des données sont remis à zéro, même si le type revient vide. Sans
+    période, les jours présents sont mis à jour et rien n'est retiré.
+    Retourne (lignes à écrire, clés supprimées) au format
+    {(grain, période, matière): valeurs} / [(grain, période, matière)].
+    """
+    days = rows["day"]
+    buckets = _contributions(data)
+    windows = windows or {}
+    dirty_days: set[tuple[str, str]] = set()
+
+    for kind, (section, _, fields) in KINDS.items():
+        if section not in data:
+            # Type non rafraîchi : l'historique reste tel quel
+            continue
+        fresh = buckets[kind]
+        if kind in windows:
+            lo, hi = windows[kind]
+            for key, values in days.items():
+                if lo <= key[0] <= hi and key not in fresh and any(values.get(f) for f in fields):
+                    for field in fields:
+                        values[field] = 0
+                    dirty_days.add(key)
+        for key, new_values in fresh.items():
+            values = days.setdefault(key, _empty())
+            if any(values.get(f, 0) != new_values.get(f, 0) for f in fields):
+                for field in fields:
+                    values[field] = new_values.get(field, 0)
+                dirty_days.add(key)
+
+    upserts: dict[tuple, dict] = {}
+    deleted: list[tuple] = []
+    for key in dirty_days:
+        if _is_empty(days[key]):
+            del days[key]
+            deleted.append(("day",) + key)
+        else:
+            upserts[("day",) + key] = days[key]
+
+    # Semaines touchées : recalculées à partir de leurs jours
+    dirty_weeks = {(_week(day), matiere) for day, matiere in dirty_days}
+    sums: dict[tuple[str, str], dict] = {key: _empty() for key in dirty_weeks}
+    for (day, matiere), values in days.items():
+        key = (_week(day), matiere)
+        if key in sums:
+            for field in FIELDS:
+                sums[key][field] += values.get(field, 0)
+    for key, values in sums.items():
+        for field in ("weighted_sum", "coef_total", "absence_hours"):
+            values[field] = round(values[field], 4)
+        if _is_empty(values):
+            if rows["week"].pop(key, None) is not None:
+                deleted.append(("week",) + key)
+        elif rows["week"].get(key) != values:
+            rows["week"][key] = values
+            upserts[("week",) + key] = values
+    return upserts, deleted
+
+
+def update(data: dict, windows: Optional[dict] = None) -> dict:
+    """
+    Met à jour les agrégats avec les données du rafraîchissement ; `windows` :
+    période récupérée par type (voir plan). Retourne {upserted, deleted}.
+    """
+    windows = {kind: (str(lo)[:10], str(hi)[:10]) for kind, (lo, hi) in (windows or {}).items() if kind in KINDS and KINDS[kind][0] in data}
+    try:
+        from db import use_database
+        if use_database():
+            return _pg_update(data, windows)
+    except ImportError:
+        pass
+    return _file_update(data, windows)
+
+
+def _month(period: str) -> str:
+    return period[:7]
+
+
+def _row(period: str, matiere: Optional[str], values: dict) -> dict:
+    row = {"period": period}
+    if matiere is not None:
+        row["matiere"] = matiere
+    row.update({field: values[field] for field in FIELDS})
+    row["moyenne"] = round(values["weighted_sum"] / values["coef_total"], 2) if values["coef_total"] else None
+    return row
+
+
+def query(
+    by: str = "week",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    matiere: Optional[str] = None,
+    total: bool = False,
+) -> list[dict]:
+    """
+    Agrégats par semaine (lignes semaine), par jour ou par mois (lignes jour),
+    ou par matière sur toute la période. total=True additionne les matières.
+    Le coût dépend du nombre de lignes agrégées, pas du nombre de notes,
+    absences ou retards.
+    """
+    if by not in ("day", "week", "month", "subject"):
+        raise ValueError(f"Regroupement inconnu: {by} (day, week, month, subject)")
+    grain = "week" if by == "week" else "day"
+    lo = date_from and (_week(date_from) if grain == "week" else date_from)
+    hi = date_to and (_week(date_to) if grain == "week" else date_to)
+    wanted = normalize_subject(matiere) if matiere else None
+
+    try:
+        from db import use_database
+        rows = _pg_rows(grain, lo, hi) if use_database() else None
+    except ImportError:
+        rows = None
+    if rows is None:
+        rows = _load_file()[grain]
+
+    groups: dict[tuple, dict] = {}
+    for (period, subject), values in rows.items():
+        if (lo and period < lo) or (hi and period > hi) or (wanted is not None and subject != wanted):
+            continue
+        if by == "subject":
+            key = ("", None if total else subject)
+        else:
+            key = (_month(period) if by == "month" else period, None if total else subject)
+        sums = groups.setdefault(key, _empty())
+        for field in FIELDS:
+            sums[field] += values.get(field, 0)
+    result = []
+    for (period, subject), values in sorted(groups.items(), key=lambda item: (item[0][0], item[0][1] or "")):
+        for field in ("weighted_sum", "coef_total", "absence_hours"):
+            values[field] = round(values[field], 4)
+        row = _row(period, subject, values)
+        if by == "subject":
+            del row["period"]
+        result.append(row)
+    return result
+
+
+# === Fichier JSON (sans Neon) ===
+
+def _load_file() -> dict:
+    try:
+        with open(ROLLUPS_FILE, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("version") == ROLLUPS_VERSION:
+            return {
+                grain: {tuple(key.split("|", 1)): values for key, values in payload.get(grain, {}).items()}
+                for grain in GRAINS
+            }
+    except (FileNotFoundError, ValueError):
+        pass
+    return {grain: {} for grain in GRAINS}
+
+
+def _file_update(data: dict, windows: dict) -> dict:
+    rows = _load_file()
+    upserts, deleted = plan(rows, data, windows)
+    if upserts or deleted:
+        payload = {"version": ROLLUPS_VERSION}
+        for grain in GRAINS:
+            payload[grain] = {f"{period}|{matiere}": values for (period, matiere), values in sorted(rows[grain].items())}
+        with open(ROLLUPS_FILE, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+    return {"upserted": len(upserts), "deleted": len(deleted)}
+
+
+# === PostgreSQL ===
+
+def _pg_rows(grain: str, lo: Optional[str] = None, hi: Optional[str] = None) -> dict:
+    from db import _get_conn
+    conn = _get_conn()
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT period, matiere, {", ".join(FIELDS)}
+            FROM pronote_rollups
+            WHERE grain = %s
+              AND (%s::text IS NULL OR period >= %s)
+              AND (%s::text IS NULL OR period <= %s)
+            """,
+            (grain, lo, lo, hi, hi),
+        )
+        return {(r[0], r[1]): dict(zip(FIELDS, r[2:])) for r in cur.fetchall()}
+
+
+def _pg_update(data: dict, windows: dict) -> dict:
+    from db import _get_conn
+    days = [key[0] for buckets in _contributions(data).values() for key in buckets]
+    days += [day for window in windows.values() for day in window]
+    if not days:
+        return {"upserted": 0, "deleted": 0}
+    # Seules les semaines couvertes par le rafraîchissement sont lues (jours entiers :
+    # les jours hors fenêtre d'une semaine touchée servent à la recalculer)
+    lo = date.fromisoformat(min(days))
+    hi = date.fromisoformat(max(days))
+    first = lo - timedelta(days=lo.weekday())
+    last = hi + timedelta(days=6 - hi.weekday())
+    rows = {
+        "day": _pg_rows("day", first.isoformat(), last.isoformat()),
+        "week": _pg_rows("week", _week(first.isoformat()), _week(last.isoformat())),
+    }
+    upserts, deleted = plan(rows, data, windows)
+    conn = _get_conn()
+    with conn.cursor() as cur:
+        for (grain, period, matiere), values in upserts.items():
+            cur.execute(
+                f"""
+                INSERT INTO pronote_rollups (grain, period, matiere, {", ".join(FIELDS)}, updated_at)
+                VALUES (%s, %s, %s, {", ".join(["%s"] * len(FIELDS))}, NOW())
+                ON CONFLICT (grain, period, matiere) DO UPDATE SET
+                    {", ".join(f"{field} = EXCLUDED.{field}" for field in FIELDS)},
+                    updated_at = EXCLUDED.updated_at
+                """,
+                (grain, period, matiere) + tuple(values[field] for field in FIELDS),
+            )
+        for grain, period, matiere in deleted:
+            cur.execute(
+                "DELETE FROM pronote_rollups WHERE grain = %s AND period = %s AND matiere = %s",
+                (grain, period, matiere),
+            )
+    return {"upserted": len(upserts), "deleted": len(deleted)}
@@ -15,9 +15,47 @@ CREATE TABLE IF NOT EXISTS pronote_credentials (
 CREATE TABLE IF NOT EXISTS pronote_cache (
   id INTEGER PRIMARY KEY CHECK (id IN (1, 2)),
   data JSONB NOT NULL DEFAULT '{}',
+  section_hashes JSONB NOT NULL DEFAULT '{}',
   export_date TIMESTAMPTZ,
   updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
+-- Empreinte SHA-256 de chaque section (notes, devoirs, ...) : sert à émettre
+-- NOTIFY pronote_cache uniquement pour les sections modifiées (bases existantes)
+ALTER TABLE pronote_cache ADD COLUMN IF NOT EXISTS section_hashes JSONB NOT NULL DEFAULT '{}';
+
+-- Index plein texte (devoirs, contenu des cours, discussions), mis à jour à chaque rafraîchissement
+CREATE TABLE IF NOT EXISTS pronote_search (
+  doc_id TEXT PRIMARY KEY,
+  section TEXT NOT NULL,
+  title TEXT NOT NULL DEFAULT '',
+  body TEXT NOT NULL DEFAULT '',
+  doc_date DATE,
+  content_hash TEXT NOT NULL,
+  tsv TSVECTOR GENERATED ALWAYS AS (
+    setweight(to_tsvector('french', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('french', coalesce(body, '')), 'B')
+  ) STORED,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS pronote_search_tsv_idx ON pronote_search USING GIN (tsv);
+
+-- Agrégats par (jour | semaine ISO, matière), mis à jour à chaque rafraîchissement (voir rollups.py).
+-- Absences et retards sont agrégés sous la matière ''.
+CREATE TABLE IF NOT EXISTS pronote_rollups (
+  grain TEXT NOT NULL CHECK (grain IN ('day', 'week')),
+  period TEXT NOT NULL,
+  matiere TEXT NOT NULL DEFAULT '',
+  absence_hours DOUBLE PRECISION NOT NULL DEFAULT 0,
+  absence_count INTEGER NOT NULL DEFAULT 0,
+  delay_minutes INTEGER NOT NULL DEFAULT 0,
+  delay_count INTEGER NOT NULL DEFAULT 0,
+  notes_count INTEGER NOT NULL DEFAULT 0,
+  weighted_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+  coef_total DOUBLE PRECISION NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (grain, period, matiere)
+);
+
 -- Aucune ligne initiale : les credentials sont créés à la première connexion QR,
 -- le cache à la première récupération des données.
@@ -0,0 +1,274 @@
+"""
+Index plein texte sur les devoirs, le contenu des cours et les discussions.
+PostgreSQL (tsvector, configuration 'french') si DATABASE_URL est défini,
+sinon SQLite FTS5 dans search.db à côté de data.json.
+L'index est mis à jour de façon incrémentale à chaque rafraîchissement.
+"""
+
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from typing import Optional
+
+SEARCH_DB_FILE = Path(__file__).parent / "search.db"
+
+SECTIONS = ("devoirs", "lessons", "discussions")
+
+# Marqueurs de surlignage dans les extraits (repris côté UI)
+HIGHLIGHT_START = "[["
+HIGHLIGHT_END = "]]"
+
+
+def _doc_key(*parts: str) -> str:
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def extract_documents(data: dict) -> list[dict]:
+    """Transforme les sections du cache en documents indexables."""
+    docs = []
+    for d in data.get("devoirs") or []:
+        docs.append({
+            "doc_id": "devoirs:" + _doc_key(d.get("matiere", ""), d.get("date_rendu", ""), d.get("description", "")),
+            "section": "devoirs",
+            "title": d.get("matiere", ""),
+            "body": d.get("description", ""),
+            "doc_date": d.get("date_rendu", "")[:10],
+        })
+    for l in data.get("lessons") or []:
+        if not l.get("contenu"):
+            continue
+        docs.append({
+            "doc_id": "lessons:" + (l.get("id") or _doc_key(l.get("matiere", ""), l.get("debut", ""))),
+            "section": "lessons",
+            "title": l.get("matiere", ""),
+            "body": l.get("contenu", ""),
+            "doc_date": l.get("debut", "")[:10],
+        })
+    for d in data.get("discussions") or []:
+        docs.append({
+            "doc_id": "discussions:" + (d.get("id") or _doc_key(d.get("sujet", ""), d.get("date", ""))),
+            "section": "discussions",
+            "title": d.get("sujet", ""),
+            "body": " ".join(filter(None, [d.get("auteur", ""), d.get("dernier_message", "")])),
+            "doc_date": d.get("date", "")[:10],
+        })
+    for doc in docs:
+        payload = json.dumps([doc["title"], doc["body"], doc["doc_date"]], ensure_ascii=False)
+        doc["content_hash"] = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+    return docs
+
+
+def _stale_ids(existing: dict, docs: list[dict], windows: dict) -> list[str]:
+    """
+    Documents à supprimer : absents du rafraîchissement alors que leur date
+    est dans la période réellement récupérée pour leur section (`windows`,
+    {section: (début, fin)} en dates ISO). Les sections sans période ne sont
+    jamais purgées : l'historique hors période reste dans l'index.
+    """
+    current = {doc["doc_id"] for doc in docs}
+    stale = []
+    for doc_id, (section, doc_date) in existing.items():
+        if doc_id in current or section not in windows:
+            continue
+        lo, hi = windows[section]
+        if lo <= (doc_date or "") <= hi:
+            stale.append(doc_id)
+    return stale
+
+
+def _plan(existing_hashes: dict, existing: dict, docs: list[dict], windows: dict) -> tuple[list[dict], list[str]]:
+    changed = [doc for doc in docs if existing_hashes.get(doc["doc_id"]) != doc["content_hash"]]
+    return changed, _stale_ids(existing, docs, windows)
+
+
+def update_index(data: dict, windows: Optional[dict] = None) -> dict:
+    """
+    Met à jour l'index avec les données du rafraîchissement. `windows` donne la
+    période récupérée par section datée ({"devoirs": (début, fin), ...}) : les
+    documents absents n'y sont supprimés que dans cette période, même si la
+    section revient vide. Les discussions (liste complète) sont remplacées en
+    entier, sauf si elles reviennent vides. Retourne {upserted, deleted}.
+    """
+    docs = extract_documents(data)
+    purge = {
+        section: (str(lo)[:10], str(hi)[:10])
+        for section, (lo, hi) in (windows or {}).items()
+        if section in ("devoirs", "lessons") and section in data
+    }
+    if data.get("discussions"):
+        purge["discussions"] = ("", "~")
+    try:
+        from db import use_database
+        if use_database():
+            return _pg_update(docs, purge)
+    except ImportError:
+        pass
+    return _sqlite_update(docs, purge)
+
+
+def search(query: str, page: int = 1, per_page: int = 10, section: Optional[str] = None) -> dict:
+    """Recherche classée par pertinence, paginée, avec extraits surlignés."""
+    page = max(1, page)
+    per_page = max(1, min(per_page, 100))
+    result = {"query": query, "page": page, "per_page": per_page, "total": 0, "results": []}
+    if not query.strip():
+        return result
+    try:
+        from db import use_database
+        if use_database():
+            total, rows = _pg_search(query, page, per_page, section)
+            result.update(total=total, results=rows)
+            return result
+    except ImportError:
+        pass
+    total, rows = _sqlite_search(query, page, per_page, section)
+    result.update(total=total, results=rows)
+    return result
+
+
+# === PostgreSQL ===
+
+def _pg_update(docs: list[dict], windows: dict) -> dict:
+    from db import _get_conn
+    conn = _get_conn()
+    with conn.cursor() as cur:
+        cur.execute("SELECT doc_id, section, doc_date, content_hash FROM pronote_search")
+        rows = cur.fetchall()
+        existing_hashes = {r[0]: r[3] for r in rows}
+        existing = {r[0]: (r[1], r[2].isoformat() if r[2] else "") for r in rows}
+        changed, stale = _plan(existing_hashes, existing, docs, windows)
+        for doc in changed:
+            cur.execute(
+                """
+                INSERT INTO pronote_search (doc_id, section, title, body, doc_date, content_hash, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, NOW())
+                ON CONFLICT (doc_id) DO UPDATE SET
+                    title = EXCLUDED.title,
+                    body = EXCLUDED.body,
+                    doc_date = EXCLUDED.doc_date,
+                    content_hash = EXCLUDED.content_hash,
+                    updated_at = EXCLUDED.updated_at
+                """,
+                (doc["doc_id"], doc["section"], doc["title"], doc["body"],
+                 doc["doc_date"] or None, doc["content_hash"]),
+            )
+        if stale:
+            cur.execute("DELETE FROM pronote_search WHERE doc_id = ANY(%s)", (stale,))
+    return {"upserted": len(changed), "deleted": len(stale)}
+
+
+def _pg_search(query: str, page: int, per_page: int, section: Optional[str]) -> tuple[int, list[dict]]:
+    from db import _get_conn
+    conn = _get_conn()
+    headline_opts = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=2, MaxWords=20, MinWords=5"
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT doc_id, section, title, doc_date,
+                   ts_headline('french', body, q, %s) AS snippet,
+                   ts_rank_cd(tsv, q) AS rank,
+                   COUNT(*) OVER () AS total
+            FROM pronote_search, websearch_to_tsquery('french', %s) AS q
+            WHERE tsv @@ q AND (%s::text IS NULL OR section = %s)
+            ORDER BY rank DESC, doc_date DESC NULLS LAST
+            LIMIT %s OFFSET %s
+            """,
+            (headline_opts, query, section, section, per_page, (page - 1) * per_page),
+        )
+        rows = cur.fetchall()
+    total = rows[0][6] if rows else 0
+    return total, [
+        {
+            "doc_id": r[0],
+            "section": r[1],
+            "title": r[2],
+            "date": r[3].isoformat() if r[3] else "",
+            "snippet": r[4],
+            "rank": float(r[5]),
+        }
+        for r in rows
+    ]
+
+
+# === SQLite FTS5 (fallback fichier) ===
+
+def _sqlite_conn() -> sqlite3.Connection:
+    conn = sqlite3.connect(SEARCH_DB_FILE)
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+            doc_id UNINDEXED, section UNINDEXED, title, body,
+            doc_date UNINDEXED, content_hash UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    return conn
+
+
+def _sqlite_update(docs: list[dict], windows: dict) -> dict:
+    conn = _sqlite_conn()
+    try:
+        with conn:
+            rows = conn.execute("SELECT doc_id, section, doc_date, content_hash FROM documents").fetchall()
+            existing_hashes = {r[0]: r[3] for r in rows}
+            existing = {r[0]: (r[1], r[2]) for r in rows}
+            changed, stale = _plan(existing_hashes, existing, docs, windows)
+            to_delete = stale + [doc["doc_id"] for doc in changed if doc["doc_id"] in existing]
+            conn.executemany("DELETE FROM documents WHERE doc_id = ?", [(i,) for i in to_delete])
+            conn.executemany(
+                "INSERT INTO documents (doc_id, section, title, body, doc_date, content_hash) VALUES (?, ?, ?, ?, ?, ?)",
+                [(d["doc_id"], d["section"], d["title"], d["body"], d["doc_date"], d["content_hash"]) for d in changed],
+            )
+    finally:
+        conn.close()
+    return {"upserted": len(changed), "deleted": len(stale)}
+
+
+def _fts5_query(query: str) -> str:
+    """Convertit une saisie libre en requête FTS5 sûre (mots entre guillemets, préfixe sur le dernier)."""
+    words = [w.replace('"', "") for w in query.split()]
+    words = [w for w in words if w]
+    if not words:
+        return '""'
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _sqlite_search(query: str, page: int, per_page: int, section: Optional[str]) -> tuple[int, list[dict]]:
+    if not SEARCH_DB_FILE.exists():
+        return 0, []
+    conn = _sqlite_conn()
+    match = _fts5_query(query)
+    where = "documents MATCH ?" + (" AND section = ?" if section else "")
+    params = [match] + ([section] if section else [])
+    try:
+        total = conn.execute(f"SELECT COUNT(*) FROM documents WHERE {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"""
+            SELECT doc_id, section, title, doc_date,
+                   snippet(documents, 3, ?, ?, '…', 16) AS snippet,
+                   bm25(documents, 0, 0, 5.0, 1.0, 0, 0) AS rank
+            FROM documents
+            WHERE {where}
+            ORDER BY rank, doc_date DESC
+            LIMIT ? OFFSET ?
+            """,
+            [HIGHLIGHT_START, HIGHLIGHT_END] + params + [per_page, (page - 1) * per_page],
+        ).fetchall()
+    finally:
+        conn.close()
+    return total, [
+        {
+            "doc_id": r[0],
+            "section": r[1],
+            "title": r[2],
+            "date": r[3],
+            "snippet": r[4],
+            # bm25() est négatif (plus petit = plus pertinent) : on l'inverse
+            "rank": -float(r[5]),
+        }
+        for r in rows
+    ]
@@ -0,0 +1,409 @@
+"""
+Serveur HTTP asyncio longue durée sur le cache Pronote.
+- GET /sections                 : {section: hash} (sans lire les données)
+- GET /sections/{nom}           : contenu JSON d'une section
+- GET /data?sections=notes,...  : plusieurs sections (toutes sauf export_date si absent) en un seul objet
+- GET /status, GET /status/full : équivalents des commandes CLI status et status_full
+- POST /refresh                 : équivalent de la commande CLI data
+  (?sections=lessons,...&from=AAAA-MM-JJ&to=AAAA-MM-JJ : rafraîchissement partiel)
+- GET /calendar.ics             : flux iCalendar (fragments en cache, voir calendar_feed.py)
+Paramètre commun : ?semestre=1|2 (Neon). ETag fort dérivé des hash de section
+(suffixe -gz pour la variante compressée), réponse 304 sur If-None-Match,
+compression gzip si acceptée par le client.
+Les appels concurrents à /status/full et /refresh partagent la même exécution ;
+les rafraîchissements de paramètres différents s'exécutent l'un après l'autre.
+Avec PRONOTE_POOL_SIZE > 1, les sessions Pronote restent ouvertes entre deux
+rafraîchissements (voir session_pool.py).
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from logger import error as log_error, info as log_info
+
+DATA_FILE = Path(__file__).parent / "data.json"
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# En dessous de cette taille la compression ne vaut pas son coût
+GZIP_MIN_SIZE = 1024
+GZIP_CACHE_SIZE = 64
+
+_STATUS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class _FileStore:
+    """Lecture de data.json, rechargé seulement si le fichier a changé."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._mtime = None
+        # (hashes, textes) remplacé d'un bloc à chaque rechargement, jamais modifié
+        self._snapshot: Optional[tuple[dict, dict]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Optional[tuple[dict, dict]]:
+        with self._lock:
+            try:
+                mtime = self.path.stat().st_mtime_ns
+            except FileNotFoundError:
+                self._mtime, self._snapshot = None, None
+                return None
+            if mtime != self._mtime:
+                from db import section_hashes
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                texts = {k: json.dumps(v, ensure_ascii=False, separators=(",", ":")) for k, v in data.items()}
+                self._snapshot = (section_hashes(data), texts)
+                self._mtime = mtime
+            return self._snapshot
+
+    def hashes(self, cache_id: int) -> Optional[dict]:
+        snapshot = self._load()
+        return dict(snapshot[0]) if snapshot else None
+
+    def snapshot(self, names: list[str], cache_id: int) -> Optional[tuple[dict, dict]]:
+        snapshot = self._load()
+        if snapshot is None:
+            return None
+        hashes, texts = snapshot
+        return dict(hashes), {n: texts[n] for n in names if n in texts}
+
+    def section_names(self, cache_id: int) -> list[str]:
+        snapshot = self._load()
+        return list(snapshot[0]) if snapshot else []
+
+
+class _DbStore:
+    """Lecture Neon : hash depuis section_hashes, données section par section."""
+
+    def hashes(self, cache_id: int) -> Optional[dict]:
+        from db import get_section_hashes
+        return get_section_hashes(cache_id)
+
+    def snapshot(self, names: list[str], cache_id: int) -> Optional[tuple[dict, dict]]:
+        from db import get_cache_snapshot
+        return get_cache_snapshot(names, cache_id)
+
+    def section_names(self, cache_id: int) -> list[str]:
+        return list(self.hashes(cache_id) or {})
+
+
+def _etag(parts: list[tuple[str, str]]) -> str:
+    """ETag fort : hash unique d'une section, sinon hash de la liste nom:hash."""
+    if len(parts) == 1:
+        return f'"{parts[0][1]}"'
+    digest = hashlib.sha256("\n".join(f"{n}:{h}" for n, h in parts).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """gzip accepté (RFC 9110 §12.5.3) : gzip ou * avec q > 0, gzip explicite prioritaire."""
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    q = weights.get("gzip", weights.get("x-gzip", weights.get("*", 0.0)))
+    return q > 0
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _gzip_etag(etag: str) -> str:
+    """ETag de la variante gzip : distinct de celui du corps non compressé (RFC 9110 §8.8.3)."""
+    return etag[:-1] + '-gz"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    """ETag (identité ou gzip) désigné par If-None-Match, None si aucun."""
+    if not if_none_match:
+        return None
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    if "*" in candidates:
+        return etag
+    for tag in (etag, _gzip_etag(etag)):
+        if tag in candidates or f"W/{tag}" in candidates:
+            return tag
+    return None
+
+
+class CacheServer:
+    def __init__(self, store=None):
+        if store is None:
+            from db import use_database
+            store = _DbStore() if use_database() else _FileStore(DATA_FILE)
+        self.store = store
+        self._gzip_cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._calendar_cache: Optional[tuple] = None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                if len(parts) != 3:
+                    await self._send(writer, 400, b'{"error":"Requete invalide"}', {}, head=False)
+                    break
+                method, target, version = parts
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._send(writer, 400, b'{"error":"Content-Length invalide"}', {"Connection": "close"}, head=False)
+                    break
+                if length:
+                    await reader.readexactly(length)
+                status, body, extra = await self._route(method, target, headers)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                extra["Connection"] = "keep-alive" if keep_alive else "close"
+                await self._send(writer, status, body, extra, head=method == "HEAD")
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, target: str, headers: dict) -> tuple[int, bytes, dict]:
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        cache_id = 2 if query.get("semestre", ["1"])[0] == "2" else 1
+        path = unquote(url.path).rstrip("/")
+        if path == "/refresh":
+            if method != "POST":
+                return 405, b'{"error":"Methode non autorisee"}', {"Allow": "POST"}
+        elif method not in ("GET", "HEAD"):
+            return 405, b'{"error":"Methode non autorisee"}', {"Allow": "GET, HEAD"}
+        loop = asyncio.get_running_loop()
+        try:
+            if path == "/status":
+                return self._json(await loop.run_in_executor(None, _command_status))
+            if path == "/status/full":
+                return self._json(await self._single_flight("status_full", _command_status_full))
+            if path == "/refresh":
+                try:
+                    args = _refresh_args(query)
+                except ValueError as e:
+                    return 400, json.dumps({"error": str(e)}).encode("utf-8"), {}
+                key = "refresh" + json.dumps(args, default=str) if any(args) else "refresh"
+                return self._json(await self._single_flight(key, lambda: _command_refresh(*args)))
+            if path == "/calendar.ics":
+                return await loop.run_in_executor(None, self._calendar, headers)
+            if path == "/health":
+                return 200, b'{"ok":true}', {}
+            if path == "/sections":
+                hashes = await loop.run_in_executor(None, self.store.hashes, cache_id)
+                if hashes is None:
+                    return 404, b'{"error":"Aucune donnee en cache"}', {}
+                body = json.dumps({"sections": hashes}, separators=(",", ":")).encode("utf-8")
+                return self._conditional(sorted(hashes.items()), body, headers)
+            if path.startswith("/sections/"):
+                return await self._serve_sections([path[len("/sections/"):]], headers, cache_id, single=True)
+            if path == "/data":
+                names = [n for n in ",".join(query.get("sections", [])).split(",") if n]
+                if not names:
+                    names = await loop.run_in_executor(None, self.store.section_names, cache_id)
+                return await self._serve_sections(names, headers, cache_id, single=False)
+            return 404, b'{"error":"Route inconnue"}', {}
+        except Exception as e:
+            log_error("Serveur: %s", e, exc_info=True)
+            return 500, json.dumps({"error": str(e)}).encode("utf-8"), {}
+
+    def _calendar(self, headers: dict) -> tuple[int, bytes, dict]:
+        """Flux iCalendar : relu seulement si ics_cache.json a changé, 304 si inchangé."""
+        from calendar_feed import ICS_CACHE_FILE, load_cache, render
+        try:
+            mtime = ICS_CACHE_FILE.stat().st_mtime_ns
+        except FileNotFoundError:
+            return 404, b'{"error":"Aucun calendrier en cache"}', {}
+        if self._calendar_cache is None or self._calendar_cache[0] != mtime:
+            cache = load_cache()
+            self._calendar_cache = (mtime, f'"{cache["hash"]}"', render(cache).encode("utf-8"))
+        _, etag, body = self._calendar_cache
+        return self._conditional_etag(etag, body, headers, {"Content-Type": "text/calendar; charset=utf-8"})
+
+    async def _single_flight(self, key: str, fn) -> dict:
+        """Une seule exécution de fn à la fois : les appels concurrents attendent son résultat."""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(None, fn)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    @staticmethod
+    def _json(result: dict) -> tuple[int, bytes, dict]:
+        return 200, json.dumps(result, ensure_ascii=False).encode("utf-8"), {}
+
+    async def _serve_sections(self, names: list[str], headers: dict, cache_id: int, single: bool) -> tuple[int, bytes, dict]:
+        loop = asyncio.get_running_loop()
+        hashes = await loop.run_in_executor(None, self.store.hashes, cache_id)
+        if hashes is None:
+            return 404, b'{"error":"Aucune donnee en cache"}', {}
+        # Validation sans lire les données quand toutes les sections ont un hash connu
+        if all(n in hashes for n in names):
+            matched = _matches(headers.get("if-none-match"), _etag([(n, hashes[n]) for n in names]))
+            if matched:
+                return 304, b"", {"ETag": matched, "Vary": "Accept-Encoding"}
+        # Hashes et corps du même instantané : l'ETag décrit toujours le corps envoyé
+        snapshot = await loop.run_in_executor(None, self.store.snapshot, names, cache_id)
+        if snapshot is None:
+            return 404, b'{"error":"Aucune donnee en cache"}', {}
+        hashes, texts = snapshot
+        missing = [n for n in names if n not in texts]
+        if single and missing:
+            return 404, json.dumps({"error": f"Section inconnue: {names[0]}"}).encode("utf-8"), {}
+        names = [n for n in names if n in texts]
+        parts = [(n, hashes.get(n) or _text_hash(texts[n])) for n in names]
+        if single:
+            body = texts[names[0]]
+        else:
+            body = "{" + ",".join(f"{json.dumps(n)}:{texts[n]}" for n in names) + "}"
+        return self._conditional(parts, body.encode("utf-8"), headers)
+
+    def _conditional(self, parts: list[tuple[str, str]], body: bytes, headers: dict) -> tuple[int, bytes, dict]:
+        return self._conditional_etag(_etag(parts), body, headers)
+
+    def _conditional_etag(self, etag: str, body: bytes, headers: dict, extra: Optional[dict] = None) -> tuple[int, bytes, dict]:
+        """304 si If-None-Match désigne l'une des variantes, sinon corps (gzip si accepté) et son ETag."""
+        matched = _matches(headers.get("if-none-match"), etag)
+        if matched:
+            return 304, b"", {"ETag": matched, "Vary": "Accept-Encoding"}
+        compress = len(body) >= GZIP_MIN_SIZE and _accepts_gzip(headers.get("accept-encoding", ""))
+        if compress:
+            etag = _gzip_etag(etag)
+        extra = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding", **(extra or {})}
+        if compress:
+            body = self._gzip(etag, body)
+            extra["Content-Encoding"] = "gzip"
+        return 200, body, extra
+
+    def _gzip(self, etag: str, body: bytes) -> bytes:
+        compressed = self._gzip_cache.get(etag)
+        if compressed is None:
+            compressed = gzip.compress(body, compresslevel=6)
+            self._gzip_cache[etag] = compressed
+            if len(self._gzip_cache) > GZIP_CACHE_SIZE:
+                self._gzip_cache.popitem(last=False)
+        else:
+            self._gzip_cache.move_to_end(etag)
+        return compressed
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, body: bytes, extra: dict, head: bool) -> None:
+        lines = [f"HTTP/1.1 {status} {_STATUS.get(status, '')}"]
+        headers = {"Content-Length": str(len(body))}
+        if status != 304:
+            headers["Content-Type"] = "application/json; charset=utf-8"
+        headers.update(extra)
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if not head and status != 304:
+            writer.write(body)
+        await writer.drain()
+
+
+def _command_status() -> dict:
+    from pronote_client import PronoteClient
+    return PronoteClient().check_credentials_exist()
+
+
+# Client connecté conservé entre deux /refresh quand le pool de sessions est
+# actif (PRONOTE_POOL_SIZE > 1) : pas de token_login par requête, et une seule
+# chaîne de jetons pour tout le processus.
+_pooled = None
+_pooled_lock = threading.Lock()
+
+# Un seul rafraîchissement à la fois par processus : complet ou partiel, chacun
+# relit puis réécrit le cache (et les index dérivés) ; en parallèle, le dernier
+# écrit écraserait les sections fusionnées par l'autre.
+_refresh_lock = threading.Lock()
+
+
+def _connected_client() -> tuple[object, dict]:
+    global _pooled
+    from pronote_client import PronoteClient
+    with _pooled_lock:
+        if _pooled is not None:
+            # Déconnexion faite entre-temps (CLI logout) : abandonner les sessions
+            if _pooled.check_credentials_exist().get("connected"):
+                with _pooled.pool.session() as session:
+                    eleve = _pooled._on_session(session).get_info_eleve()
+                return _pooled, {"connected": True, "eleve": eleve}
+            _pooled.pool.close()
+            _pooled = None
+        client = PronoteClient()
+        connect_result = client.connect_with_token()
+        if connect_result.get("connected") and client.pool is not None:
+            client.pool.start_keep_alive()
+            _pooled = client
+        return client, connect_result
+
+
+def _command_status_full() -> dict:
+    return _connected_client()[1]
+
+
+def _refresh_args(query: dict) -> tuple:
+    """(sections, date_from, date_to) de POST /refresh?sections=...&from=...&to=... (ValueError si invalides)."""
+    from pronote_client import parse_window, select_sections
+    names = [n for n in ",".join(query.get("sections", [])).split(",") if n]
+    date_from, date_to = parse_window(query.get("from", [None])[0], query.get("to", [None])[0])
+    return select_sections(names) if names else None, date_from, date_to
+
+
+def _command_refresh(sections=None, date_from=None, date_to=None) -> dict:
+    with _refresh_lock:
+        client, connect_result = _connected_client()
+        if not connect_result.get("connected"):
+            return {"error": "Non connecte", "details": connect_result}
+        return client.get_all_data(sections, date_from, date_to)
+
+
+async def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+    server = CacheServer()
+    srv = await asyncio.start_server(server.handle, host, port)
+    log_info("Serveur cache sur http://%s:%s", host, port)
+    async with srv:
+        await srv.serve_forever()
+
+
+def run(host: Optional[str] = None, port: Optional[int] = None) -> None:
+    host = host or os.environ.get("PRONOTE_SERVER_HOST", DEFAULT_HOST)
+    port = port or int(os.environ.get("PRONOTE_SERVER_PORT", DEFAULT_PORT))
+    try:
+        asyncio.run(serve(host, port))
+    except KeyboardInterrupt:
+        pass
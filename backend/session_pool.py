@@ -0,0 +1,227 @@
+"""
+Pool de sessions pronotepy authentifiées sur le même compte.
+
+Chaque session garde sa propre requests.Session (connexions HTTP keep-alive
+réutilisées d'un appel à l'autre) et ne sert qu'une opération à la fois : les
+récupérations indépendantes (sections du cache) sont réparties sur les sessions
+libres. Les sessions sont ouvertes à la demande, jusqu'à la taille du pool
+(PRONOTE_POOL_SIZE, défaut 1 : comportement séquentiel historique).
+
+Rotation du jeton : chaque token_login consomme le jeton courant et en émet un
+nouveau. Ouvertures et reconnexions (refresh de pronotepy) sont donc
+sérialisées sous un même verrou, partent toujours du dernier jeton émis, et
+chaque nouveau jeton est transmis à on_rotate pour être sauvegardé.
+
+Santé : une session inactive depuis HEALTH_CHECK_AFTER secondes est vérifiée
+(requête Navigation) avant d'être prêtée ; une session invalide est fermée et
+remplacée. start_keep_alive() fait de même en tâche de fond (serveur).
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+import pronotepy
+
+from logger import debug as log, warning as log_warning
+
+DEFAULT_POOL_SIZE = 1
+
+# Délai d'inactivité après lequel pronotepy relance la session (_KeepAlive)
+HEALTH_CHECK_AFTER = 110
+
+
+def pool_size(value=None) -> int:
+    """Taille du pool : valeur explicite, sinon PRONOTE_POOL_SIZE (minimum 1)."""
+    if value is None:
+        value = os.environ.get("PRONOTE_POOL_SIZE", DEFAULT_POOL_SIZE)
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return DEFAULT_POOL_SIZE
+
+
+class SessionPool:
+    """Sessions pronotepy partageant la chaîne de jetons d'un même compte."""
+
+    def __init__(
+        self,
+        url: str,
+        uuid: str,
+        username: str,
+        password: str,
+        size: Optional[int] = None,
+        on_rotate: Optional[Callable[[str, str], None]] = None,
+        client: Optional[pronotepy.Client] = None,
+    ):
+        self.url = url
+        self.uuid = uuid
+        self.size = pool_size(size)
+        self._username = username
+        self._password = password
+        self._on_rotate = on_rotate
+        # Réentrant : le refresh de pronotepy peut relancer une requête
+        self._token_lock = threading.RLock()
+        self._lock = threading.Lock()
+        # LIFO : la session la plus récemment utilisée a ses connexions encore ouvertes
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._sessions: list[pronotepy.Client] = []
+        self._opening = 0
+        self._keep_alive: Optional[threading.Event] = None
+        if client is not None:
+            self._adopt(client)
+
+    def _adopt(self, client: pronotepy.Client) -> None:
+        # Toute reconnexion de pronotepy (post en erreur -> refresh) passe par le pool
+        client.refresh = lambda: self._refresh(client)
+        with self._lock:
+            self._sessions.append(client)
+        self._idle.put(client)
+
+    def _rotated(self, client: pronotepy.Client) -> None:
+        """Enregistre le jeton émis par la dernière connexion (verrou jeton tenu)."""
+        if (client.username, client.password) == (self._username, self._password):
+            return
+        self._username, self._password = client.username, client.password
+        if self._on_rotate is not None:
+            try:
+                self._on_rotate(client.username, client.password)
+            except Exception as e:
+                log_warning("Sauvegarde du nouveau jeton impossible: %s", e)
+
+    def _open(self) -> pronotepy.Client:
+        with self._token_lock:
+            client = pronotepy.Client.token_login(self.url, self._username, self._password, self.uuid)
+            if not client.logged_in:
+                raise RuntimeError("Session Pronote refusée (jeton invalide ou expiré)")
+            self._rotated(client)
+        client.refresh = lambda: self._refresh(client)
+        with self._lock:
+            self._sessions.append(client)
+        log("Session Pronote ouverte (%s/%s)", len(self._sessions), self.size)
+        return client
+
+    def _refresh(self, client: pronotepy.Client) -> None:
+        with self._token_lock:
+            client.username, client.password = self._username, self._password
+            type(client).refresh(client)
+            self._rotated(client)
+
+    def _healthy(self, client: pronotepy.Client) -> bool:
+        if time.time() - client.communication.last_ping < HEALTH_CHECK_AFTER:
+            return True
+        try:
+            # Navigation ; pronotepy se reconnecte (refresh coordonné) si la session a expiré
+            client.session_check()
+            return client.logged_in
+        except Exception as e:
+            log_warning("Session Pronote invalide, remplacée: %s", e)
+            return False
+
+    def _discard(self, client: pronotepy.Client) -> None:
+        with self._lock:
+            if client in self._sessions:
+                self._sessions.remove(client)
+        try:
+            client.communication.session.close()
+        except Exception:
+            pass
+
+    def _checkout(self, timeout: Optional[float]) -> pronotepy.Client:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                client = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = len(self._sessions) + self._opening < self.size
+                    if can_open:
+                        self._opening += 1
+                if can_open:
+                    try:
+                        return self._open()
+                    finally:
+                        with self._lock:
+                            self._opening -= 1
+                # Attente par tranches : une session fermée entre-temps libère une place
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                try:
+                    client = self._idle.get(timeout=1.0 if remaining is None else min(1.0, remaining))
+                except queue.Empty:
+                    continue
+            if self._healthy(client):
+                return client
+            self._discard(client)
+
+    @contextmanager
+    def session(self, timeout: Optional[float] = None):
+        """Prête une session saine (ouverte si besoin) ; queue.Empty si timeout dépassé."""
+        client = self._checkout(timeout)
+        try:
+            yield client
+        except Exception:
+            # Vérifier la session avant de la prêter à nouveau
+            client.communication.last_ping = 0
+            raise
+        finally:
+            self._idle.put(client)
+
+    def run(self, tasks: dict[str, Callable[[pronotepy.Client], Any]]) -> dict[str, Any]:
+        """Exécute {nom: fn(client)} en parallèle sur les sessions du pool."""
+        def call(fn):
+            with self.session() as client:
+                return fn(client)
+
+        if self.size == 1 or len(tasks) <= 1:
+            return {name: call(fn) for name, fn in tasks.items()}
+        with ThreadPoolExecutor(max_workers=min(self.size, len(tasks))) as executor:
+            futures = {name: executor.submit(call, fn) for name, fn in tasks.items()}
+            return {name: future.result() for name, future in futures.items()}
+
+    def start_keep_alive(self, interval: float = HEALTH_CHECK_AFTER / 2) -> None:
+        """Vérifie périodiquement les sessions inactives (processus longue durée)."""
+        if self._keep_alive is not None:
+            return
+        stop = self._keep_alive = threading.Event()
+
+        def loop():
+            while not stop.wait(interval):
+                idle = []
+                while True:
+                    try:
+                        idle.append(self._idle.get_nowait())
+                    except queue.Empty:
+                        break
+                for client in idle:
+                    if self._healthy(client):
+                        self._idle.put(client)
+                    else:
+                        self._discard(client)
+
+        threading.Thread(target=loop, name="pronote-pool-keepalive", daemon=True).start()
+
+    def stats(self) -> dict:
+        return {"size": self.size, "open": len(self._sessions), "idle": self._idle.qsize()}
+
+    def close(self) -> None:
+        if self._keep_alive is not None:
+            self._keep_alive.set()
+            self._keep_alive = None
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for client in sessions:
+            try:
+                client.communication.session.close()
+            except Exception:
+                pass
@@ -0,0 +1,226 @@
+"""
+Index d'intervalles sur l'emploi du temps, construit à chaque rafraîchissement
+des cours et stocké avec eux (clé "timetable" du cache).
+
+Les cours sont triés par (début, fin) ; l'index garde des positions dans
+data["lessons"] et les horaires ISO en parallèle (comparés comme chaînes, sans
+reparser les cours). La durée maximale d'un cours borne la recherche : les
+cours qui chevauchent [a, b) commencent dans [a - durée max, b), une seule
+recherche dichotomique suffit. Les chevauchements (deux cours non annulés en
+même temps, même salle ou non) sont calculés une fois au build.
+
+Requêtes en O(log n + k) : créneaux libres, cours en cours, prochain cours,
+chevauchements et conflits de salle, cours annulés.
+"""
+
+import json
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+TIMETABLE_VERSION = 2
+
+DAY_START = "08:00"
+DAY_END = "18:00"
+
+
+def _instant(value: str) -> str:
+    """Horodatage comparable (AAAA-MM-JJTHH:MM:SS) d'une date ou date-heure ISO."""
+    value = value.replace(" ", "T")
+    return value[:19] if "T" in value else value[:10] + "T00:00:00"
+
+
+def _shift(instant: str, minutes: int) -> str:
+    return (datetime.fromisoformat(instant) + timedelta(minutes=minutes)).isoformat()[:19]
+
+
+def _minutes(start: str, end: str) -> int:
+    return int((datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds() // 60)
+
+
+def _lower_bound(items: list, value: str, key) -> int:
+    """Premier rang r de `items` (triés selon key) tel que key(items[r]) >= value."""
+    lo, hi = 0, len(items)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if key(items[mid]) < value:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _lessons_hash(lessons: list[dict]) -> str:
+    """Empreinte de la section lessons (même calcul que db.section_hashes)."""
+    from db import section_hashes
+    return section_hashes({"lessons": lessons})["lessons"]
+
+
+def build_timetable(lessons: list[dict]) -> dict:
+    """
+    Construit l'index :
+    - order : positions des cours triées par (début, fin)
+    - starts / ends : horaires parallèles à order
+    - active / canceled : rangs (dans order) des cours maintenus / annulés
+    - max_minutes : durée du plus long cours
+    - overlaps : [[rang, rang]] des cours maintenus qui se chevauchent, triés par le second
+    - lessons_hash : empreinte des cours indexés (index périmé si elle diffère)
+    """
+    timed = [
+        (_instant(l["debut"]), _instant(l["fin"]), i)
+        for i, l in enumerate(lessons) if l.get("debut") and l.get("fin")
+    ]
+    timed.sort()
+    starts = [s for s, _, _ in timed]
+    ends = [e for _, e, _ in timed]
+    active = [r for r, (_, _, i) in enumerate(timed) if not lessons[i].get("annule")]
+    canceled = [r for r, (_, _, i) in enumerate(timed) if lessons[i].get("annule")]
+
+    # Balayage : cours ouverts (fin > début courant) parmi les cours maintenus
+    overlaps = []
+    open_ranks: list[int] = []
+    for r in active:
+        open_ranks = [o for o in open_ranks if ends[o] > starts[r]]
+        overlaps.extend([o, r] for o in open_ranks)
+        open_ranks.append(r)
+
+    return {
+        "version": TIMETABLE_VERSION,
+        "order": [i for _, _, i in timed],
+        "starts": starts,
+        "ends": ends,
+        "active": active,
+        "canceled": canceled,
+        "max_minutes": max((_minutes(s, e) for s, e, _ in timed), default=0),
+        "overlaps": overlaps,
+        "lessons_hash": _lessons_hash(lessons),
+    }
+
+
+def _bounds(date_from: Optional[str], date_to: Optional[str]) -> tuple[str, str]:
+    lo = _instant(date_from) if date_from else ""
+    hi = (_instant(date_to) if "T" in date_to else date_to[:10] + "T23:59:59") if date_to else "~"
+    return lo, hi
+
+
+def _lesson(index: dict, lessons: list[dict], rank: int) -> dict:
+    return lessons[index["order"][rank]]
+
+
+def between(index: dict, lessons: list[dict], start: str, end: str, include_canceled: bool = False) -> list[dict]:
+    """Cours qui chevauchent [start, end)."""
+    start, end = _instant(start), _instant(end)
+    starts, ends = index["starts"], index["ends"]
+    first = bisect_left(starts, _shift(start, -index["max_minutes"]))
+    last = bisect_left(starts, end, first)
+    return [
+        _lesson(index, lessons, r) for r in range(first, last)
+        if ends[r] > start and (include_canceled or not _lesson(index, lessons, r).get("annule"))
+    ]
+
+
+def at(index: dict, lessons: list[dict], instant: str) -> list[dict]:
+    """Cours (non annulés) en cours à l'instant donné."""
+    instant = _instant(instant)
+    return between(index, lessons, instant, _shift(instant, 1))
+
+
+def next_lesson(index: dict, lessons: list[dict], after: str) -> Optional[dict]:
+    """Premier cours non annulé commençant à partir de `after`."""
+    active = index["active"]
+    starts = index["starts"]
+    rank = _lower_bound(active, _instant(after), lambda r: starts[r])
+    return _lesson(index, lessons, active[rank]) if rank < len(active) else None
+
+
+def free_slots(
+    index: dict,
+    lessons: list[dict],
+    day: str,
+    day_start: str = DAY_START,
+    day_end: str = DAY_END,
+    min_minutes: int = 0,
+) -> list[dict]:
+    """
+    Créneaux libres d'une journée entre day_start et day_end (HH:MM) : cours
+    annulés comptés comme libres, créneaux plus courts que min_minutes ignorés.
+    """
+    lo, hi = f"{day[:10]}T{day_start}:00", f"{day[:10]}T{day_end}:00"
+    busy = sorted((_instant(l["debut"]), _instant(l["fin"])) for l in between(index, lessons, lo, hi))
+    slots = []
+    cursor = lo
+    for start, end in busy + [(hi, hi)]:
+        start = min(start, hi)
+        if start > cursor and _minutes(cursor, start) >= max(min_minutes, 1):
+            slots.append({"debut": cursor, "fin": start, "minutes": _minutes(cursor, start)})
+        cursor = max(cursor, end)
+    return slots
+
+
+def overlaps(
+    index: dict,
+    lessons: list[dict],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    same_room: bool = False,
+) -> list[dict]:
+    """
+    Paires de cours maintenus qui se chevauchent (commençant dans la période) ;
+    same_room=True ne garde que les conflits de salle.
+    """
+    lo, hi = _bounds(date_from, date_to)
+    pairs, starts = index["overlaps"], index["starts"]
+    result = []
+    for k in range(_lower_bound(pairs, lo, lambda pair: starts[pair[1]]), len(pairs)):
+        i, j = pairs[k]
+        if starts[j] > hi:
+            break
+        a, b = _lesson(index, lessons, i), _lesson(index, lessons, j)
+        if same_room and not (a.get("salle") and a.get("salle") == b.get("salle")):
+            continue
+        result.append({"salle": a.get("salle") if a.get("salle") == b.get("salle") else None, "lessons": [a, b]})
+    return result
+
+
+def canceled(index: dict, lessons: list[dict], date_from: Optional[str] = None, date_to: Optional[str] = None) -> list[dict]:
+    """Cours annulés commençant dans la période."""
+    lo, hi = _bounds(date_from, date_to)
+    ranks, starts = index["canceled"], index["starts"]
+    result = []
+    for k in range(_lower_bound(ranks, lo, lambda r: starts[r]), len(ranks)):
+        r = ranks[k]
+        if starts[r] > hi:
+            break
+        result.append(_lesson(index, lessons, r))
+    return result
+
+
+def load(data_file: Path) -> tuple[list[dict], dict]:
+    """
+    Cours et index du cache (Neon : seules ces deux sections sont lues) ;
+    index reconstruit s'il est absent ou ne correspond plus aux cours.
+    """
+    sections = None
+    try:
+        from db import use_database
+        if use_database():
+            from db import get_cache_sections
+            sections = {k: json.loads(v) for k, v in get_cache_sections(["lessons", "timetable"]).items()}
+    except ImportError:
+        pass
+    if sections is None:
+        try:
+            with open(data_file, "r", encoding="utf-8") as f:
+                sections = json.load(f)
+        except FileNotFoundError:
+            sections = {}
+    lessons = sections.get("lessons") or []
+    index = sections.get("timetable")
+    if (
+        not index
+        or index.get("version") != TIMETABLE_VERSION
+        or index.get("lessons_hash") != _lessons_hash(lessons)
+    ):
+        index = build_timetable(lessons)
+    return lessons, index
@@ -0,0 +1,212 @@
+"""
+Enregistrement / rejeu des échanges avec le serveur Pronote.
+
+Les échanges sont capturés au niveau de pronotepy._Communication (nom de la
+fonction Pronote, requête et réponse déchiffrées) : le chiffrement AES de session
+étant aléatoire, c'est le niveau le plus bas où un rejeu reste déterministe.
+Tout le code de PronoteClient (token_login, homework, lessons, menus,
+discussions, periods...) s'exécute inchangé au-dessus.
+
+Variables d'environnement :
+- PRONOTE_TRANSPORT : "record" ou "replay" (désactivé si absent)
+- PRONOTE_FIXTURES : archive des échanges (défaut: fixtures/pronote_exchanges.json.gz)
+- PRONOTE_REPLAY_LATENCY_MS : latence artificielle par requête en rejeu,
+  fixe ("80") ou aléatoire dans un intervalle ("40-120")
+
+Les secrets de connexion (jeton d'appli mobile, clé de session, challenge)
+sont masqués dans l'archive : le rejeu n'en a pas besoin, le challenge est
+seulement chiffré côté client et la clé de session n'est pas dérivée.
+"""
+
+import atexit
+import copy
+import gzip
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+FIXTURES_FILE = Path(__file__).parent / "fixtures" / "pronote_exchanges.json.gz"
+ARCHIVE_VERSION = 1
+
+# Champs de connexion masqués dans l'archive (requêtes et réponses)
+SECRET_KEYS = {"jetonConnexionAppliMobile", "cle", "challenge", "uuidAppliMobile"}
+REDACTED = "***"
+
+_mode: Optional[str] = None
+
+
+def mode() -> Optional[str]:
+    """Mode actif : "record", "replay" ou None."""
+    return _mode
+
+
+def _parse_latency(value: str) -> tuple[float, float]:
+    """ "80" -> (0.08, 0.08), "40-120" -> (0.04, 0.12) en secondes."""
+    if not value:
+        return 0.0, 0.0
+    low, _, high = value.partition("-")
+    low_s = float(low) / 1000
+    return low_s, (float(high) / 1000 if high else low_s)
+
+
+def _redact(value):
+    """Copie JSON de la valeur, secrets de connexion remplacés par REDACTED."""
+    if isinstance(value, dict):
+        return {k: (REDACTED if k in SECRET_KEYS and v else _redact(v)) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_redact(v) for v in value]
+    return value
+
+
+class FixtureArchive:
+    """Archive des échanges : attributs de la page d'accueil + liste ordonnée des appels."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.attributes: dict = {}
+        self.exchanges: list[dict] = []
+        self._lock = threading.Lock()
+        self._cursor: dict[str, int] = {}
+        self._used: set[int] = set()
+
+    @classmethod
+    def load(cls, path: Path) -> "FixtureArchive":
+        archive = cls(path)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("version") != ARCHIVE_VERSION:
+            raise ValueError(f"Version d'archive non supportée: {payload.get('version')}")
+        archive.attributes = payload.get("attributes", {})
+        archive.exchanges = payload.get("exchanges", [])
+        return archive
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            payload = {
+                "version": ARCHIVE_VERSION,
+                "recorded_at": datetime.now().isoformat(),
+                "attributes": self.attributes,
+                "exchanges": self.exchanges,
+            }
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+
+    def record(self, function_name: str, request: dict, response: dict) -> None:
+        with self._lock:
+            self.exchanges.append({
+                "function": function_name,
+                "request": _redact(json.loads(json.dumps(request, default=str))),
+                "response": _redact(json.loads(json.dumps(response, default=str))),
+            })
+
+    def take(self, function_name: str, request: dict) -> dict:
+        """
+        Réponse enregistrée pour cet appel : d'abord un échange de même fonction
+        avec une requête identique, sinon le suivant dans l'ordre d'enregistrement
+        (les requêtes datées diffèrent quand on rejoue un autre jour).
+        En fin de liste, les échanges de la fonction sont réutilisés en boucle.
+        """
+        # Même masquage qu'à l'enregistrement pour comparer les requêtes
+        normalized = _redact(json.loads(json.dumps(request, default=str)))
+        with self._lock:
+            candidates = [i for i, ex in enumerate(self.exchanges) if ex["function"] == function_name]
+            if not candidates:
+                raise LookupError(f"Aucun échange enregistré pour {function_name}")
+            for i in candidates:
+                if i not in self._used and self.exchanges[i]["request"] == normalized:
+                    break
+            else:
+                unused = [i for i in candidates if i not in self._used]
+                if unused:
+                    i = unused[0]
+                else:
+                    cursor = self._cursor.get(function_name, 0)
+                    i = candidates[cursor % len(candidates)]
+                    self._cursor[function_name] = cursor + 1
+            self._used.add(i)
+            # Copie : pronotepy peut modifier la réponse reçue
+            return copy.deepcopy(self.exchanges[i]["response"])
+
+
+def _recording_communication(base, archive: FixtureArchive):
+    class RecordingCommunication(base):
+        def initialise(self, client_identifier=None):
+            result = super().initialise(client_identifier)
+            archive.attributes = dict(self.attributes)
+            return result
+
+        def post(self, function_name, data, decryption_change=None):
+            response = super().post(function_name, data, decryption_change=decryption_change)
+            archive.record(function_name, data, response)
+            return response
+
+    return RecordingCommunication
+
+
+def _replay_communication(base, archive: FixtureArchive, latency: tuple[float, float]):
+    from pronotepy.exceptions import PronoteAPIError
+
+    class ReplayCommunication(base):
+        def initialise(self, client_identifier=None):
+            self.attributes = dict(archive.attributes)
+            self.encrypt_requests = self.attributes.get("CrA", False)
+            self.compress_requests = self.attributes.get("CoA", False)
+            initial_response = self.post("FonctionParametres", {"data": {"identifiantNav": client_identifier}})
+            return self.attributes, initial_response
+
+        def post(self, function_name, data, decryption_change=None):
+            if "Signature" in data and data["Signature"].get("onglet") not in self.authorized_onglets:
+                raise PronoteAPIError("Action not permitted. (onglet is not normally accessible)")
+            low, high = latency
+            if high > 0:
+                time.sleep(random.uniform(low, high))
+            try:
+                response = archive.take(function_name, data)
+            except LookupError as e:
+                raise PronoteAPIError(str(e))
+            self.request_number += 2
+            self.last_ping = int(time.time())
+            if decryption_change is not None:
+                if "iv" in decryption_change:
+                    self.encryption.aes_iv = decryption_change["iv"]
+                if "key" in decryption_change:
+                    self.encryption.aes_key = decryption_change["key"]
+            return response
+
+        def after_auth(self, data, auth_key):
+            # Les réponses sont déjà déchiffrées : pas de clé de session à dériver
+            self.encryption.aes_key = auth_key
+
+    return ReplayCommunication
+
+
+def configure(transport: Optional[str] = None, fixtures: Optional[str] = None, latency: Optional[str] = None) -> Optional[str]:
+    """
+    Active l'enregistrement ou le rejeu (paramètres explicites ou variables
+    d'environnement). À appeler avant toute connexion. Retourne le mode actif.
+    """
+    global _mode
+    transport = transport or os.environ.get("PRONOTE_TRANSPORT", "")
+    if transport not in ("record", "replay"):
+        return None
+    path = Path(fixtures or os.environ.get("PRONOTE_FIXTURES") or FIXTURES_FILE)
+
+    import pronotepy.clients as clients
+    from pronotepy.pronoteAPI import _Communication
+
+    if transport == "record":
+        archive = FixtureArchive(path)
+        clients._Communication = _recording_communication(_Communication, archive)
+        atexit.register(archive.save)
+    else:
+        archive = FixtureArchive.load(path)
+        delay = _parse_latency(latency if latency is not None else os.environ.get("PRONOTE_REPLAY_LATENCY_MS", ""))
+        clients._Communication = _replay_communication(_Communication, archive, delay)
+    _mode = transport
+    return _mode
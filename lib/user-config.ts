@@ -14,6 +14,18 @@ const STORAGE_KEYS = {
   completedTasks: 'focus-tonight-completed',
 }
 
+/**
+ * Transmet contrôles et / ou configuration au backend, qui recalcule le plan
+ * Focus stocké dans le cache (best effort : localStorage reste la référence UI)
+ */
+export function syncFocusInputs(inputs: { config?: FocusConfig; controles?: Controle[] }): void {
+  fetch('/api/focus/inputs', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(inputs),
+  }).catch(error => console.error('Erreur synchronisation Focus:', error))
+}
+
 // ==========================================
 // CONFIGURATION
 // ==========================================
@@ -51,6 +63,7 @@ export function saveConfig(config: FocusConfig): void {
   } catch (error) {
     console.error('Erreur sauvegarde config:', error)
   }
+  syncFocusInputs({ config })
 }
 
 /**
@@ -109,6 +122,7 @@ export function saveControles(controles: Controle[]): void {
   } catch (error) {
     console.error('Erreur sauvegarde contrôles:', error)
   }
+  syncFocusInputs({ controles })
 }
 
 /**
@@ -33,6 +33,7 @@ export interface Devoir {
   date_rendu: string
   fait: boolean
   fichiers: string[]
+  id?: string
 }
 
 export interface Lesson {
@@ -97,6 +98,69 @@ export interface PronoteData {
   discussions?: Discussion[]
   absences?: Absence[]
   retards?: Retard[]
+  /** Analyses des notes précalculées par le backend Python (moyennes, tendances, notes requises). */
+  analytics?: PronoteAnalytics
+  /** Index précalculés par le backend Python (positions dans lessons / devoirs / notes). */
+  indexes?: PronoteIndexes
+  /** Plans Focus des 7 prochains jours précalculés par le backend Python. */
+  focus?: PronoteFocus
+  /** Index d'intervalles de l'emploi du temps (rangs dans l'ordre chronologique, positions dans lessons). */
+  timetable?: PronoteTimetable
+}
+
+export type GradeTrend = 'up' | 'down' | 'stable' | 'unknown'
+
+export interface SubjectAnalytics {
+  notes_count: number
+  weighted_sum: number
+  coef_total: number
+  moyenne_calculee: number | null
+  /** Moyenne officielle Pronote si disponible, sinon moyenne recalculée. */
+  moyenne_eleve: number | null
+  moyenne_classe: number | null
+  slope: number | null
+  trend: GradeTrend
+  /** [date, moyenne cumulée] dans l'ordre chronologique. */
+  evolution: [string, number][]
+  /** Cible ("10" à "18") -> coefficient ("1", "2") -> note requise sur 20 (null si hors de 0-20). */
+  required_grades: Record<string, Record<string, number | null>>
+}
+
+export interface PronoteAnalytics {
+  version: number
+  engine: 'numpy' | 'python'
+  general_average: number | null
+  trend: GradeTrend
+  slope: number | null
+  /** Clé = nom normalisé de la matière. */
+  subjects: Record<string, SubjectAnalytics>
+}
+
+export interface PronoteIndexes {
+  version: number
+  lessons_by_day: Record<string, number[]>
+  devoirs_by_date: Record<string, number[]>
+  devoirs_by_matiere: Record<string, number[]>
+  devoirs_pending: number[]
+  notes_by_matiere: Record<string, number[]>
+  notes_by_date: number[]
+}
+
+export interface PronoteTimetable {
+  version: number
+  order: number[]
+  starts: string[]
+  ends: string[]
+  active: number[]
+  canceled: number[]
+  max_minutes: number
+  overlaps: [number, number][]
+  lessons_hash: string
+}
+
+export interface PronoteFocus {
+  version: number
+  days: { date: string; hash: string; plan: FocusPlan }[]
 }
 
 export interface AuthStatus {